@@ -4,7 +4,7 @@ from PyInstaller.utils.hooks import copy_metadata
 
 datas = [('backend/templates', 'templates'), ('backend/instance', 'instance'), ('uploads', 'uploads')]
 binaries = []
-hiddenimports = ['flask', 'flask_sqlalchemy', 'sqlalchemy', 'pandas', 'openpyxl', 'xlrd', 'werkzeug', 'jinja2', 'webbrowser', 'threading']
+hiddenimports = ['flask', 'flask_sqlalchemy', 'sqlalchemy', 'pandas', 'numpy', 'openpyxl', 'xlrd', 'werkzeug', 'jinja2', 'webbrowser', 'threading', 'waitress']
 datas += copy_metadata('flask')
 datas += copy_metadata('werkzeug')
 tmp_ret = collect_all('flask')
@@ -1,15 +1,42 @@
-from flask import  Flask, render_template, request, redirect, url_for, jsonify, flash
+from flask import  Flask, render_template, request, redirect, url_for, jsonify, flash, Response, stream_with_context, send_file, abort
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.utils import secure_filename
+from markupsafe import Markup
 from datetime import datetime
 import os
 import sys
-import pandas as pd
-from utils.processing import (
-    limpiar_inventario_csv, cargar_inventario_a_db,
-    procesar_recetas_csv, cargar_recetas_a_db
+from utils.processing import cargar_inventario_a_db, cargar_recetas_a_db, convertir_unidades_guardadas
+from utils.produccion import calcular_produccion_recetas
+from utils.export import (
+    filas_stock, filas_recetas, filas_produccion, generar_csv, generar_xlsx,
+    COLUMNAS_STOCK, COLUMNAS_RECETAS, COLUMNAS_PRODUCCION
 )
-from models import db, Producto, Receta, RecetaComponente
+from utils.cache import (
+    version_receta, obtener_fragmento_receta, guardar_fragmento_receta, invalidar_recetas,
+    incrementar_version_datos
+)
+from utils.web import respuesta_condicional, registrar_compresion
+from utils.alertas import (
+    resumen_vencimientos, lotes_por_vencer,
+    ESTADOS_VENCIMIENTO, DIAS_ALERTA_CORTA
+)
+from utils.busqueda import buscar
+from utils.lecturas import lotes_stock, recetas_con_componentes
+from utils.almacen import PedidoConHash, ArchivoSubido, guardar_en_almacen, aplicar_retencion
+from utils.metricas import registrar_metricas
+from utils.importaciones import historial_importaciones, ETAPAS, NOMBRES_ETAPAS
+from utils.movimientos import (
+    registrar_vaciado_stock, crear_punto_control_si_corresponde, inicializar_libro_stock,
+    stock_a_fecha, movimientos_de
+)
+from utils.depositos import (
+    depositos, en_deposito, en_todos, eliminar_depositos, validar_nombre, carpeta_por_defecto
+)
+from utils.consultas_lentas import (
+    registrar_consultas_lentas, consultas_lentas, resumen_por_sentencia,
+    vaciar_consultas_lentas, umbral_ms
+)
+from models import db, Producto, Receta, RecetaComponente, asegurar_indices
 
 # Configurar rutas para PyInstaller
 if getattr(sys, 'frozen', False):
@@ -30,42 +57,89 @@ os.makedirs(instance_path, exist_ok=True)
 os.makedirs(upload_folder, exist_ok=True)
 
 app = Flask(__name__, template_folder=template_folder, instance_path=instance_path)
+app.request_class = PedidoConHash  # Los uploads se reciben en un buffer que calcula su hash
 app.config['SECRET_KEY'] = 'tu_clave_secreta_aqui'
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(instance_path, "app.db")}'
+# APPLAB_DATABASE_URI permite usar otra base (por ejemplo en los benchmarks)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'APPLAB_DATABASE_URI', f'sqlite:///{os.path.join(instance_path, "app.db")}'
+)
+# Stock por depósito: un archivo SQLite por depósito, por defecto junto a la base principal
+app.config['DEPOSITOS_DIR'] = os.environ.get('APPLAB_DEPOSITOS_DIR') or carpeta_por_defecto(
+    app.config['SQLALCHEMY_DATABASE_URI'], instance_path
+)
 app.config['UPLOAD_FOLDER'] = upload_folder
 app.config['ALLOWED_EXTENSIONS'] = {'xls', 'xlsx', 'csv'}
+# Retención de uploads/: se borran los archivos más viejos al pasar cualquiera de los límites (0 = sin límite)
+app.config['UPLOADS_MAX_ARCHIVOS'] = int(os.environ.get('APPLAB_UPLOADS_MAX_ARCHIVOS', 50))
+app.config['UPLOADS_MAX_MB'] = int(os.environ.get('APPLAB_UPLOADS_MAX_MB', 500))
+app.config['UPLOADS_MAX_DIAS'] = int(os.environ.get('APPLAB_UPLOADS_MAX_DIAS', 90))
+# Métricas por pedido en /metrics (APPLAB_METRICAS=0 las desactiva por completo)
+app.config['METRICAS'] = os.environ.get('APPLAB_METRICAS', '1') == '1'
+app.config['METRICAS_SERVER_TIMING'] = os.environ.get('APPLAB_SERVER_TIMING') == '1'
+# Sentencias que tardan más que el umbral (ms) quedan en /consultas-lentas con su plan.
+# Desactivado si no se define (o es negativo): mide cada fila leída y corre EXPLAIN en el pedido
+_umbral_consultas_lentas = os.environ.get('APPLAB_CONSULTAS_LENTAS_MS')
+app.config['CONSULTAS_LENTAS_MS'] = float(_umbral_consultas_lentas) if _umbral_consultas_lentas else None
+app.config['CONSULTAS_LENTAS_MAXIMO'] = int(os.environ.get('APPLAB_CONSULTAS_LENTAS_MAXIMO', 200))
 
+registrar_metricas(app)  # Antes de init_app: configura las conexiones de SQLAlchemy
+registrar_consultas_lentas(app)
 db.init_app(app)
+registrar_compresion(app)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template(
+        'index.html',
+        resumen=resumen_vencimientos(),
+        proximos=lotes_por_vencer(DIAS_ALERTA_CORTA, limite=8),
+        dias_alerta=DIAS_ALERTA_CORTA
+    )
 
 @app.route('/cargar')
 def cargar():
     """Página para cargar archivos de stock o recetas"""
-    return render_template('cargar.html')
+    return render_template('cargar.html', depositos=depositos())
 
 @app.route('/stock')
+@respuesta_condicional
 def stock():
     """Página para visualizar el stock"""
-    productos = Producto.query.filter_by(is_master=False).all()
-    return render_template('stock.html', productos=productos, now=datetime.now)
+    # Solo columnas (sin objetos Producto); el estado de vencimiento se calcula en la consulta
+    lotes = lotes_stock(datetime.now())
+    return render_template('stock.html', lotes=lotes, estados=ESTADOS_VENCIMIENTO,
+                           varios_depositos=len(depositos()) > 1)
 
 @app.route('/recetas')
+@respuesta_condicional
 def recetas():
     """Página para visualizar las recetas"""
-    recetas_list = Receta.query.all()
-    return render_template('recetas.html', recetas=recetas_list)
+    receta_ids = db.session.execute(db.select(Receta.id).order_by(Receta.id)).scalars().all()
+    
+    # Leer las versiones antes de consultar, así una carga concurrente invalida lo renderizado
+    versiones = {receta_id: version_receta(receta_id) for receta_id in receta_ids}
+    fragmentos = {receta_id: obtener_fragmento_receta(receta_id) for receta_id in receta_ids}
+    faltantes = [receta_id for receta_id, html in fragmentos.items() if html is None]
+    
+    if faltantes:
+        # Una sola consulta con recetas, componentes y nombres de productos (sin objetos del ORM)
+        solo_faltantes = faltantes if len(faltantes) < len(receta_ids) else None
+        for receta in recetas_con_componentes(solo_faltantes):
+            html = Markup(render_template('receta_fragmento.html', receta=receta))
+            guardar_fragmento_receta(receta.id, versiones[receta.id], html)
+            fragmentos[receta.id] = html
+    
+    return render_template('recetas.html', fragmentos=[fragmentos[receta_id] for receta_id in receta_ids if fragmentos.get(receta_id)])
 
 @app.route('/produccion')
+@respuesta_condicional
 def produccion():
-    """Página para calcular la producción"""
-    recetas_list = Receta.query.all()
-    return render_template('produccion.html', recetas=recetas_list)
+    """Página para calcular la producción (las recetas se eligen con /buscar)"""
+    total_recetas = db.session.execute(db.select(db.func.count()).select_from(Receta)).scalar()
+    return render_template('produccion.html', total_recetas=total_recetas)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -81,29 +155,72 @@ def upload_file():
         flash('No se seleccionó ningún archivo', 'danger')
         return redirect(url_for('cargar'))
     
+    if tipo not in ('stock', 'recetas'):
+        flash('Tipo de archivo no válido', 'danger')
+        return redirect(url_for('cargar'))
+    
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # El archivo ya está en un buffer temporal con su hash: se procesa sin releerlo de disco
+        archivo = ArchivoSubido.desde_upload(file, secure_filename(file.filename))
         
         # Procesar el archivo según el tipo
         try:
+            # Se valida antes de guardar la copia: un pedido rechazado no deja nada en uploads/
+            deposito = validar_nombre(request.form.get('deposito')) if tipo == 'stock' else None
+            # Copia por contenido en uploads/ (un archivo repetido no se vuelve a escribir)
+            guardar_en_almacen(app.config['UPLOAD_FOLDER'], archivo)
             if tipo == 'stock':
-                resultado = cargar_inventario_a_db(filepath)
-                flash(f'Stock cargado exitosamente: {resultado["productos_cargados"]} nuevos, {resultado["productos_actualizados"]} actualizados', 'success')
+                # Cada depósito es su propio archivo: cargas de distintos depósitos no se bloquean entre sí
+                with en_deposito(deposito):
+                    resultado = cargar_inventario_a_db(archivo)
+                flash(f'Stock cargado exitosamente en el depósito {deposito}: {resultado["productos_cargados"]} nuevos, {resultado["productos_actualizados"]} actualizados', 'success')
             elif tipo == 'recetas':
-                resultado = cargar_recetas_a_db(filepath)
+                resultado = cargar_recetas_a_db(archivo)
                 flash(f'Recetas: procesadas {resultado["total_recetas_procesadas"]}, cargadas {resultado["recetas_cargadas"]}, componentes {resultado["total_componentes"]}, productos encontrados {resultado["productos_encontrados"]}, creados {resultado["productos_creados"]}', 'success')
-            else:
-                flash('Tipo de archivo no válido', 'danger')
+                flash(f'Cambios: {resultado["recetas_nuevas"]} recetas nuevas, {resultado["recetas_actualizadas"]} modificadas y {resultado["recetas_sin_cambios"]} sin cambios; '
+                      f'componentes {resultado["componentes_agregados"]} agregados, {resultado["componentes_actualizados"]} actualizados y {resultado["componentes_eliminados"]} eliminados', 'info')
         except Exception as e:
             flash(f'Error al procesar el archivo: {str(e)}', 'danger')
+        finally:
+            aplicar_retencion(
+                app.config['UPLOAD_FOLDER'],
+                max_archivos=app.config['UPLOADS_MAX_ARCHIVOS'],
+                max_bytes=app.config['UPLOADS_MAX_MB'] * 1024 * 1024,
+                max_dias=app.config['UPLOADS_MAX_DIAS']
+            )
         
         return redirect(url_for('cargar'))
     else:
         flash('Tipo de archivo no permitido', 'danger')
         return redirect(url_for('cargar'))
 
+@app.route('/importaciones')
+def importaciones():
+    """Historial de cargas de archivos con el tiempo de cada etapa"""
+    tipo = request.args.get('tipo')
+    if tipo not in ('inventario', 'recetas'):
+        tipo = None
+    limite = max(1, min(request.args.get('limite', 50, type=int), 500))
+    registros = historial_importaciones(tipo, limite)
+    maximo = max((r.seg_total for r in registros), default=0)
+    return render_template('importaciones.html', importaciones=registros, tipo=tipo,
+                           etapas=ETAPAS, nombres_etapas=NOMBRES_ETAPAS, maximo=maximo)
+
+@app.route('/consultas-lentas')
+def ver_consultas_lentas():
+    """Últimas sentencias SQL que superaron el umbral, con su plan de ejecución"""
+    registros = consultas_lentas()
+    return render_template('consultas_lentas.html', registros=registros,
+                           resumen=resumen_por_sentencia(registros), umbral_ms=umbral_ms(),
+                           maximo=app.config['CONSULTAS_LENTAS_MAXIMO'])
+
+@app.route('/consultas-lentas/vaciar', methods=['POST'])
+def vaciar_registro_consultas_lentas():
+    """Vacía el registro de consultas lentas"""
+    vaciar_consultas_lentas()
+    flash('Registro de consultas lentas vaciado', 'success')
+    return redirect(url_for('ver_consultas_lentas'))
+
 @app.route('/vaciar-recetas', methods=['POST'])
 def vaciar_recetas():
     """Endpoint para vaciar todas las recetas y sus componentes"""
@@ -126,6 +243,8 @@ def vaciar_recetas():
             db.session.delete(producto)
         
         db.session.commit()
+        invalidar_recetas()
+        incrementar_version_datos()
         flash(f'Recetas vaciadas: {num_recetas} recetas, {num_componentes} componentes y {num_maestros_eliminados} productos maestros eliminados', 'success')
     except Exception as e:
         db.session.rollback()
@@ -135,10 +254,18 @@ def vaciar_recetas():
 
 @app.route('/vaciar-stock', methods=['POST'])
 def vaciar_stock():
-    """Endpoint para vaciar todo el stock (elimina productos de stock, mantiene maestros)"""
+    """Endpoint para vaciar todo el stock de todos los depósitos (elimina productos de stock, mantiene maestros)"""
     try:
-        num_productos_eliminados = Producto.query.filter_by(is_master=False).delete()
-        db.session.commit()
+        num_productos_eliminados = 0
+        for deposito in depositos():
+            with en_deposito(deposito):
+                # El libro de movimientos conserva lo que había antes de borrarlo
+                registrar_vaciado_stock()
+                num_productos_eliminados += Producto.query.filter_by(is_master=False).delete()
+                db.session.commit()
+                crear_punto_control_si_corresponde()
+        invalidar_recetas()
+        incrementar_version_datos()
         flash(f'Stock vaciado: {num_productos_eliminados} productos de stock eliminados', 'success')
     except Exception as e:
         db.session.rollback()
@@ -146,106 +273,137 @@ def vaciar_stock():
     
     return redirect(url_for('stock'))
 
+def _recetas_del_pedido():
+    """Lista 'recetas' del cuerpo JSON (vacía sin cuerpo JSON); ValueError si el cuerpo no es un objeto"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValueError('El cuerpo debe ser un objeto JSON')
+    return data.get('recetas', [])
+
 @app.route('/calcular-produccion', methods=['POST'])
 def calcular_produccion():
     """Endpoint para calcular si se puede producir las recetas seleccionadas"""
-    data = request.get_json()
-    recetas_seleccionadas = data.get('recetas', [])
-    
-    resultados = []
-    productos_necesarios = {}
-    
-    # Calcular la cantidad total de cada producto necesario
-    for receta_data in recetas_seleccionadas:
-        receta_id = receta_data['id']
-        cantidad = receta_data['cantidad']
-        
-        receta = db.session.get(Receta, receta_id)
-        if not receta:
-            continue
-        
-        for componente in receta.componentes:
-            producto_id = componente.producto_id
-            cantidad_necesaria = componente.cantidad_necesaria * cantidad
-            
-            if producto_id in productos_necesarios:
-                productos_necesarios[producto_id] += cantidad_necesaria
-            else:
-                productos_necesarios[producto_id] = cantidad_necesaria
+    try:
+        resultado = calcular_produccion_recetas(_recetas_del_pedido())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(resultado)
+
+def _respuesta_exportacion(nombre, formato, columnas, filas):
+    """Arma la respuesta de descarga en CSV (streaming) o XLSX"""
+    fecha = datetime.now().strftime('%Y%m%d')
+    if formato == 'csv':
+        return Response(
+            stream_with_context(generar_csv(columnas, filas)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={nombre}_{fecha}.csv'}
+        )
+    if formato == 'xlsx':
+        archivo = generar_xlsx(columnas, filas, titulo=nombre.capitalize())
+        return send_file(
+            archivo,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f'{nombre}_{fecha}.xlsx'
+        )
+    abort(404)
+
+@app.route('/exportar/stock.<formato>')
+def exportar_stock(formato):
+    """Descarga todos los lotes de stock en CSV o XLSX"""
+    return _respuesta_exportacion('stock', formato, COLUMNAS_STOCK, filas_stock())
+
+@app.route('/exportar/recetas.<formato>')
+def exportar_recetas(formato):
+    """Descarga las recetas con sus componentes en CSV o XLSX"""
+    return _respuesta_exportacion('recetas', formato, COLUMNAS_RECETAS, filas_recetas())
+
+@app.route('/exportar/produccion.<formato>', methods=['POST'])
+def exportar_produccion(formato):
+    """Descarga el resultado del cálculo de producción en CSV o XLSX"""
+    if formato not in ('csv', 'xlsx'):
+        abort(404)
+    try:
+        resultado = calcular_produccion_recetas(_recetas_del_pedido())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _respuesta_exportacion('produccion', formato, COLUMNAS_PRODUCCION, filas_produccion(resultado))
+
+@app.route('/buscar')
+def buscar_endpoint():
+    """Búsqueda con autocompletado sobre productos y recetas (índice FTS5 de cada depósito)"""
+    texto = request.args.get('q', '')
+    tipo = request.args.get('tipo')
+    if tipo not in (None, 'producto', 'receta'):
+        return jsonify({'error': 'tipo debe ser producto o receta'}), 400
+    limite = max(1, min(request.args.get('limite', 20, type=int), 100))
     
-    puede_producir = True
-    detalles = []
+    return jsonify({'resultados': buscar(texto, tipo=tipo, limite=limite)})
+
+@app.route('/alertas/vencimientos')
+def alertas_vencimientos():
+    """Lotes que vencen en los próximos días y resumen por franja de vencimiento"""
+    dias = request.args.get('dias', DIAS_ALERTA_CORTA, type=int)
+    incluir_vencidos = request.args.get('incluir_vencidos', '0') == '1'
+    limite = request.args.get('limite', type=int)
+    if limite is not None:
+        # Sin límite se devuelven todos; uno negativo sería LIMIT -1 en SQLite
+        limite = max(1, min(limite, 1000))
     
-    for producto_id, cantidad_necesaria in productos_necesarios.items():
-        producto_referencia = db.session.get(Producto, producto_id)
-        
-        if not producto_referencia:
-            continue
-        
-        productos_stock = Producto.query.filter_by(
-            codigo=producto_referencia.codigo,
-            is_master=False
-        ).order_by(Producto.fecha_vencimiento.asc()).all()
-        
-        fecha_actual = datetime.now()
-        productos_stock_validos = [
-            p for p in productos_stock 
-            if p.fecha_vencimiento is None or p.fecha_vencimiento >= fecha_actual
-        ]
-        
-        cantidad_disponible = sum(p.cantidad_disponible for p in productos_stock_validos)
-        
-        # Preparar lista de todos los lotes (para mostrar en detalles)
-        todos_los_lotes = []
-        cantidad_restante = cantidad_necesaria
-        
-        for producto in productos_stock:
-            es_vencido = producto.fecha_vencimiento and producto.fecha_vencimiento < fecha_actual
-            
-            # Calcular si está próximo a vencer (menos de 90 días)
-            proximo_vencer = False
-            if producto.fecha_vencimiento and not es_vencido:
-                dias_hasta_vencimiento = (producto.fecha_vencimiento - fecha_actual).days
-                proximo_vencer = dias_hasta_vencimiento < 90
-            
-            cantidad_a_usar = 0
-            
-            # Solo calcular cantidad a usar si no está vencido y todavía se necesita
-            if not es_vencido and cantidad_restante > 0:
-                cantidad_a_usar = min(producto.cantidad_disponible, cantidad_restante)
-                cantidad_restante -= cantidad_a_usar
-            
-            todos_los_lotes.append({
-                'lote': producto.lote or 'S/L',
-                'cantidad': cantidad_a_usar,
-                'cantidad_total': producto.cantidad_disponible,
-                'vencimiento': producto.fecha_vencimiento.strftime('%Y-%m-%d') if producto.fecha_vencimiento else 'N/A',
-                'vencido': es_vencido,
-                'proximo_vencer': proximo_vencer
-            })
-        
-        if cantidad_disponible < cantidad_necesaria:
-            puede_producir = False
-            detalles.append({
-                'producto': producto_referencia.nombre or producto_referencia.codigo,
-                'necesario': cantidad_necesaria,
-                'disponible': cantidad_disponible,
-                'faltante': cantidad_necesaria - cantidad_disponible,
-                'lotes': todos_los_lotes,
-                'estado': 'insuficiente'
-            })
-        else:
-            detalles.append({
-                'producto': producto_referencia.nombre or producto_referencia.codigo,
-                'necesario': cantidad_necesaria,
-                'disponible': cantidad_disponible,
-                'lotes': todos_los_lotes,
-                'estado': 'suficiente'
-            })
+    return jsonify({
+        'dias': dias,
+        'resumen': resumen_vencimientos(),
+        'lotes': lotes_por_vencer(dias, incluir_vencidos=incluir_vencidos, limite=limite)
+    })
+
+def _depositos_pedidos():
+    """Depósitos de ?deposito= (todos si no viene), o None si no existe"""
+    deposito = request.args.get('deposito')
+    if not deposito:
+        return depositos()
+    return [deposito] if deposito in depositos() else None
+
+@app.route('/stock/a-fecha')
+def stock_historico():
+    """Stock por código y lote tal como estaba en una fecha (YYYY-MM-DD o fecha y hora ISO)"""
+    texto = request.args.get('fecha', '')
+    try:
+        fecha = datetime.fromisoformat(texto)
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida, usar YYYY-MM-DD o YYYY-MM-DDTHH:MM'}), 400
+    if len(texto) == 10:
+        # Solo el día: el stock al final de ese día
+        fecha = datetime.combine(fecha.date(), datetime.max.time())
     
+    nombres = _depositos_pedidos()
+    if nombres is None:
+        return jsonify({'error': 'Depósito inexistente'}), 404
+    codigo = request.args.get('codigo') or None
+    lotes = [
+        dict(lote, deposito=deposito)
+        for deposito, lotes in en_todos(lambda: stock_a_fecha(fecha, codigo=codigo), nombres)
+        for lote in lotes
+    ]
+    return jsonify({'fecha': fecha.isoformat(timespec='seconds'), 'lotes': lotes})
+
+@app.route('/stock/movimientos/<codigo>')
+def movimientos_stock(codigo):
+    """Últimos movimientos de stock de un código, opcionalmente de un lote"""
+    limite = max(1, min(request.args.get('limite', 200, type=int), 1000))
+    nombres = _depositos_pedidos()
+    if nombres is None:
+        return jsonify({'error': 'Depósito inexistente'}), 404
+    lote = request.args.get('lote')
+    movimientos = [
+        dict(movimiento, deposito=deposito)
+        for deposito, movimientos in en_todos(lambda: movimientos_de(codigo, lote, limite), nombres)
+        for movimiento in movimientos
+    ]
+    movimientos.sort(key=lambda movimiento: movimiento['fecha'], reverse=True)
     return jsonify({
-        'puede_producir': puede_producir,
-        'detalles': detalles
+        'codigo': codigo,
+        'movimientos': movimientos[:limite]
     })
 
 @app.route('/resetear-db', methods=['POST'])
@@ -254,9 +412,12 @@ def resetear_db():
     try:
         # Eliminar todas las tablas
         db.drop_all()
+        eliminar_depositos()
         # Recrear todas las tablas
         db.create_all()
-        flash('Base de datos reseteada completamente. Todas las recetas y productos han sido eliminados.', 'success')
+        invalidar_recetas()
+        incrementar_version_datos()
+        flash('Base de datos reseteada completamente. Todas las recetas, productos y depósitos han sido eliminados.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error al resetear la base de datos: {str(e)}', 'danger')
@@ -277,17 +438,19 @@ def shutdown():
 
 
 if __name__ == '__main__':
-    import webbrowser
-    import threading
+    from utils.servidor import leer_configuracion, abrir_navegador_al_iniciar, iniciar_servidor
+    
+    # Desde el código fuente se usa el servidor de desarrollo salvo que se pida --modo produccion
+    config = leer_configuracion(modo_por_defecto='desarrollo')
     
     with app.app_context():
         db.create_all()
+        asegurar_indices()
+        convertir_unidades_guardadas()
+        inicializar_libro_stock()
     
-    def open_browser():
-        webbrowser.open('http://127.0.0.1:5000')
-    
-    timer = threading.Timer(1.5, open_browser)
-    timer.start()
+    if not config.sin_navegador:
+        abrir_navegador_al_iniciar(config.host, config.puerto)
     
-    # Ejecutar Flask sin debug mode cuando es .exe
-    app.run(debug=False, host='127.0.0.1', port=5000)
+    # Ejecutar sin debug mode ni reloader
+    iniciar_servidor(app, config)
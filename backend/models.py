@@ -1,6 +1,35 @@
+from contextvars import ContextVar
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.util import find_tables
 
-db = SQLAlchemy()
+# Tablas que se particionan por depósito (ver utils/depositos.py)
+TABLAS_STOCK = frozenset(('productos', 'movimientos_stock', 'puntos_control_stock', 'puntos_control_lotes'))
+# Motor del depósito activo en este thread; None es la base principal
+motor_deposito = ContextVar('motor_deposito', default=None)
+
+
+class SesionPorDeposito(Session):
+    """Session que manda las sentencias sobre tablas de stock al depósito activo"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        motor = motor_deposito.get()
+        if motor is not None and bind is None and _usa_tablas_stock(mapper, clause):
+            return motor
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _usa_tablas_stock(mapper, clause):
+    if mapper is not None:
+        return getattr(inspect(mapper).persist_selectable, 'name', None) in TABLAS_STOCK
+    if clause is not None:
+        return any(getattr(tabla, 'name', None) in TABLAS_STOCK for tabla in find_tables(clause, include_crud=True))
+    return False
+
+
+db = SQLAlchemy(session_options={'class_': SesionPorDeposito})
 
 # ==================== MODELOS ====================
 class Producto(db.Model):
@@ -17,6 +46,13 @@ class Producto(db.Model):
 
     componentes = db.relationship('RecetaComponente', back_populates='producto')
 
+    __table_args__ = (
+        # Consultas por rango de vencimiento (alertas) sobre el stock
+        db.Index('ix_productos_stock_vencimiento', 'is_master', 'fecha_vencimiento'),
+        # Resolución de componentes de recetas por código sin distinguir mayúsculas
+        db.Index('ix_productos_codigo_minusculas', db.func.lower(codigo)),
+    )
+
     def __repr__(self):
         return f'<Producto {self.nombre}>'
 
@@ -44,11 +80,112 @@ class RecetaComponente(db.Model):
     receta = db.relationship('Receta', back_populates='componentes')
     producto = db.relationship('Producto', back_populates='componentes')
 
+    __table_args__ = (
+        # Componentes de las recetas que trae una carga (comparación con lo guardado)
+        db.Index('ix_receta_componentes_receta', 'receta_id'),
+    )
+
     def __repr__(self):
         return f'<RecetaComponente RecetaID: {self.receta_id}, ProductoID: {self.producto_id}, Cantidad: {self.cantidad_necesaria} {self.unidad}>'
 
+class Importacion(db.Model):
+    """Registro de cada carga de archivo, con el tiempo de cada etapa para comparar entre cargas"""
+    __tablename__ = 'importaciones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, nullable=False, index=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'inventario' o 'recetas'
+    archivo = db.Column(db.String(255), nullable=False)
+    hash_sha256 = db.Column(db.String(64), nullable=True)
+    tamano_bytes = db.Column(db.Integer, nullable=True)
+    lector = db.Column(db.String(50), nullable=True)  # Con qué se leyó el archivo (csv, xlrd, openpyxl)
+    exito = db.Column(db.Boolean, nullable=False, default=True)
+    error = db.Column(db.Text, nullable=True)
+
+    # Segundos por etapa
+    seg_lectura = db.Column(db.Float, nullable=False, default=0)
+    seg_limpieza = db.Column(db.Float, nullable=False, default=0)
+    seg_resolucion = db.Column(db.Float, nullable=False, default=0)
+    seg_escritura = db.Column(db.Float, nullable=False, default=0)
+    seg_commit = db.Column(db.Float, nullable=False, default=0)
+    seg_total = db.Column(db.Float, nullable=False, default=0)
+
+    filas_leidas = db.Column(db.Integer, nullable=False, default=0)
+    filas_validas = db.Column(db.Integer, nullable=False, default=0)
+    registros_creados = db.Column(db.Integer, nullable=False, default=0)
+    registros_actualizados = db.Column(db.Integer, nullable=False, default=0)
+    memoria_pico_bytes = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f'<Importacion {self.tipo} {self.archivo} {self.fecha}>'
+
+class MovimientoStock(db.Model):
+    """
+    Libro de movimientos de stock: solo se agregan filas, nunca se modifican.
+    La suma de `cantidad` por código y lote hasta una fecha es el stock a esa fecha.
+    """
+    __tablename__ = 'movimientos_stock'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, nullable=False)
+    codigo = db.Column(db.String(50), nullable=False)
+    lote = db.Column(db.String(50), nullable=True)
+    unidad = db.Column(db.String(20), nullable=False)
+    cantidad = db.Column(db.Float, nullable=False)  # Variación (negativa si baja el stock)
+    origen = db.Column(db.String(20), nullable=False)  # 'importacion', 'vaciar_stock', 'conversion_unidades'
+    referencia = db.Column(db.String(255), nullable=True)  # Archivo importado, etc.
+
+    __table_args__ = (
+        db.Index('ix_movimientos_stock_fecha', 'fecha'),
+        db.Index('ix_movimientos_stock_codigo_lote', 'codigo', 'lote'),
+    )
+
+    def __repr__(self):
+        return f'<MovimientoStock {self.codigo} {self.lote} {self.cantidad:+}>'
+
+class PuntoControlStock(db.Model):
+    """Foto compacta del stock por código y lote hasta un movimiento, para no sumar todo el libro"""
+    __tablename__ = 'puntos_control_stock'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, nullable=False, index=True)  # Fecha del último movimiento incluido
+    hasta_movimiento_id = db.Column(db.Integer, nullable=False)
+
+    lotes = db.relationship('PuntoControlLote', cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<PuntoControlStock {self.fecha} hasta {self.hasta_movimiento_id}>'
+
+class PuntoControlLote(db.Model):
+    __tablename__ = 'puntos_control_lotes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    punto_id = db.Column(db.Integer, db.ForeignKey('puntos_control_stock.id'), nullable=False)
+    codigo = db.Column(db.String(50), nullable=False)
+    lote = db.Column(db.String(50), nullable=True)
+    unidad = db.Column(db.String(20), nullable=False)
+    cantidad = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_puntos_control_lotes_punto_codigo', 'punto_id', 'codigo'),
+    )
+
 # ==================== FIN MODELOS ====================
 
+def asegurar_indices(motor=None, tablas=None):
+    """
+    Crea los índices que falten en tablas ya existentes.
+    db.create_all() no agrega índices nuevos a una base creada con una versión anterior.
+    Con `motor` y `tablas` se usa en otra base, solo con esas tablas (los depósitos).
+    """
+    # IF NOT EXISTS en vez de checkfirst: la reflexión de SQLite no ve los índices por expresión
+    with (motor or db.engine).begin() as conexion:
+        for tabla in db.metadata.sorted_tables:
+            if tablas is not None and tabla.name not in tablas:
+                continue
+            for indice in tabla.indexes:
+                conexion.execute(CreateIndex(indice, if_not_exists=True))
+
 
 
 
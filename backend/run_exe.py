@@ -2,22 +2,16 @@
 Script de inicio optimizado para el ejecutable
 Evita bucles infinitos y problemas de congelamiento
 """
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.utils import secure_filename
-from datetime import datetime
 import os
 import sys
-import pandas as pd
-from utils.processing import (
-    limpiar_inventario_csv, cargar_inventario_a_db,
-    procesar_recetas_csv, cargar_recetas_a_db
-)
-from models import db, Producto, Receta, RecetaComponente
-import webbrowser
-import threading
 import time
 
+# Perfil de inicio: debe activarse antes de cualquier import pesado
+PERFIL_INICIO = '--perfil-inicio' in sys.argv or os.environ.get('APPLAB_PERFIL_INICIO') == '1'
+if PERFIL_INICIO:
+    from utils import perfil_inicio
+    perfil_inicio.activar()
+
 # Configurar rutas para PyInstaller
 if getattr(sys, 'frozen', False):
     # Ejecutando como .exe
@@ -26,13 +20,12 @@ else:
     # Ejecutando como script
     bundle_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Importar la app desde app.py
+# Importar la app desde app.py (pandas y openpyxl se cargan recién al procesar un archivo)
 from app import app
-
-def abrir_navegador():
-    """Abre el navegador después de que el servidor esté listo"""
-    time.sleep(1.5)  # Esperar a que el servidor inicie
-    webbrowser.open('http://127.0.0.1:5000')
+from models import db, asegurar_indices
+from utils.movimientos import inicializar_libro_stock
+from utils.processing import convertir_unidades_guardadas
+from utils.servidor import leer_configuracion, abrir_navegador_al_iniciar, iniciar_servidor, esperar_servidor
 
 if __name__ == '__main__':
     # Prevenir múltiples ejecuciones
@@ -44,29 +37,37 @@ if __name__ == '__main__':
     except ImportError:
         pass
     
+    config = leer_configuracion()
+    
+    if PERFIL_INICIO:
+        marcas = [('App importada', time.perf_counter())]
+        perfil_inicio.registrar_primer_pedido(app)
+    
     # Crear las tablas si no existen
     with app.app_context():
         db.create_all()
+        asegurar_indices()
+        convertir_unidades_guardadas()
+        inicializar_libro_stock()
+    
+    if PERFIL_INICIO:
+        marcas.append(('Base de datos lista', time.perf_counter()))
+        perfil_inicio.medir_primer_pedido(config.host, config.puerto, marcas, esperar_servidor)
     
-    # Abrir navegador en un thread separado
-    threading.Thread(target=abrir_navegador, daemon=True).start()
+    # Abrir navegador cuando el servidor acepte conexiones
+    if not config.sin_navegador:
+        abrir_navegador_al_iniciar(config.host, config.puerto)
     
     print("=" * 60)
     print("AppLab iniciado correctamente!")
-    print("Servidor corriendo en: http://127.0.0.1:5000")
+    print(f"Servidor corriendo en: http://{config.host}:{config.puerto} (modo {config.modo}, {config.hilos} hilos)")
     print("El navegador se abrirá automáticamente...")
     print("Presiona CTRL+C para detener el servidor")
     print("=" * 60)
     
     # Iniciar servidor sin debug mode ni reloader
     try:
-        app.run(
-            debug=False,
-            use_reloader=False,
-            host='127.0.0.1',
-            port=5000,
-            threaded=True
-        )
+        iniciar_servidor(app, config)
     except KeyboardInterrupt:
         print("\nServidor detenido correctamente")
         sys.exit(0)
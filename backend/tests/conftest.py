@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# La app lee la configuración al importarse: base y depósitos en una carpeta temporal
+_CARPETA = tempfile.mkdtemp(prefix='applab_tests_')
+os.environ.setdefault('APPLAB_DATABASE_URI', f'sqlite:///{os.path.join(_CARPETA, "app.db")}')
+os.environ.setdefault('APPLAB_DEPOSITOS_DIR', os.path.join(_CARPETA, 'depositos'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as aplicacion  # noqa: E402
+from models import db  # noqa: E402
+from utils.depositos import eliminar_depositos  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with aplicacion.app_context():
+        db.drop_all()
+        db.create_all()
+        eliminar_depositos()
+        yield aplicacion
+        db.session.remove()
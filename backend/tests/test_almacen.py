@@ -0,0 +1,22 @@
+import os
+
+from utils.almacen import ArchivoSubido, BufferConHash, aplicar_retencion, guardar_en_almacen
+
+
+def _subido(nombre, contenido):
+    buffer = BufferConHash()
+    buffer.write(contenido)
+    return ArchivoSubido(nombre, buffer, buffer.sha256, buffer.tamano)
+
+
+def test_retencion_solo_toca_el_almacen_por_contenido(tmp_path):
+    carpeta = str(tmp_path)
+    viejo = tmp_path / 'inventario_2024.csv'  # Guardado suelto por una versión anterior
+    viejo.write_bytes(b'viejo')
+    ruta, nuevo = guardar_en_almacen(carpeta, _subido('stock.csv', b'a,b\n1,2\n'))
+    assert nuevo and os.path.exists(ruta)
+    assert guardar_en_almacen(carpeta, _subido('otro.csv', b'a,b\n1,2\n')) == (ruta, False)
+
+    assert aplicar_retencion(carpeta, max_archivos=0, max_bytes=1) == 1
+    assert not os.path.exists(os.path.dirname(ruta))
+    assert viejo.read_bytes() == b'viejo'
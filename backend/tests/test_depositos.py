@@ -0,0 +1,28 @@
+from models import db, Producto
+from utils.depositos import en_deposito
+from utils.processing import cargar_inventario_a_db
+
+INVENTARIO = """Listado de stock por lote,,,,,,,,,
+,Fecha: 2026-10-19,,,,,,,,
+,,,,,,,,,
+,Artículo,,Descripción,Lote,Vto.,Estado,Unidad,Cantidad,Total
+,MP000001,,Glicerina,L0001,2027-01-31,Aprobado,Kg,2,10
+"""
+
+
+def test_carga_en_deposito_completa_nombre_del_maestro(app, tmp_path):
+    db.session.add(Producto(codigo='MP000001', nombre='', unidad='g', is_master=True))
+    db.session.commit()
+    archivo = tmp_path / 'inventario.csv'
+    archivo.write_text(INVENTARIO, encoding='utf-8')
+
+    with en_deposito('norte'):
+        resultado = cargar_inventario_a_db(str(archivo))
+        lote = Producto.query.filter_by(codigo='MP000001', is_master=False).one()
+        assert (lote.lote, lote.cantidad_disponible, lote.unidad) == ('L0001', 2000, 'g')
+
+    assert resultado['productos_cargados'] == 1
+    maestro = Producto.query.filter_by(codigo='MP000001', is_master=True).one()
+    assert maestro.nombre == 'Glicerina'
+    # El lote quedó solo en el archivo del depósito
+    assert Producto.query.filter_by(is_master=False).count() == 0
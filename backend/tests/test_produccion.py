@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'recetas': [{'id': 1, 'cantidad': 'dos'}]},
+    {'recetas': [{'id': 1, 'cantidad': 0}]},
+    {'recetas': [{'id': 1}]},
+    {'recetas': 'x'},
+    [1],
+])
+def test_calcular_produccion_rechaza_pedidos_invalidos(app, cuerpo):
+    respuesta = app.test_client().post('/calcular-produccion', json=cuerpo)
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
+
+
+def test_calcular_produccion_acepta_cantidad_como_texto_y_cuerpo_vacio(app):
+    cliente = app.test_client()
+    assert cliente.post('/calcular-produccion', json={'recetas': [{'id': 1, 'cantidad': '2'}]}).status_code == 200
+    assert cliente.post('/calcular-produccion', data='no es json').get_json() == {'puede_producir': True, 'detalles': []}
+
+
+def test_exportar_produccion_valida_el_formato_antes_de_calcular(app):
+    cliente = app.test_client()
+    assert cliente.post('/exportar/produccion.pdf', json={'recetas': [{'id': 1, 'cantidad': 'x'}]}).status_code == 404
+    assert cliente.post('/exportar/produccion.csv', json={'recetas': [{'id': 1, 'cantidad': -1}]}).status_code == 400
@@ -0,0 +1,21 @@
+from models import db, Producto, RecetaComponente, Receta
+from utils.processing import convertir_unidades_guardadas
+
+
+def test_convierte_una_vez_las_unidades_del_importador_anterior(app):
+    receta = Receta(codigo='PT1', nombre='Receta')
+    maestro = Producto(codigo='MP1', nombre='Maestro', unidad='g', is_master=True)
+    db.session.add_all([
+        receta, maestro,
+        Producto(codigo='MP1', nombre='Maestro', lote='L1', unidad='kilos', cantidad_disponible=2),
+        Producto(codigo='MP2', nombre='Otro', lote='L2', unidad='cc', cantidad_disponible=500),
+        RecetaComponente(receta=receta, producto=maestro, cantidad_necesaria=250, unidad='mg'),
+    ])
+    db.session.commit()
+
+    assert convertir_unidades_guardadas() == 3
+    assert convertir_unidades_guardadas() == 0
+    lotes = Producto.query.filter_by(is_master=False).order_by(Producto.codigo).all()
+    assert [(p.unidad, p.cantidad_disponible) for p in lotes] == [('g', 2000), ('L', 0.5)]
+    componente = RecetaComponente.query.one()
+    assert (componente.unidad, componente.cantidad_necesaria) == ('g', 0.25)
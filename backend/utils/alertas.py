@@ -0,0 +1,142 @@
+import threading
+from datetime import datetime, date, timedelta
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db, Producto
+from utils.cache import version_datos
+from utils.depositos import en_todos, deposito_actual
+
+# Umbrales de alerta (en días hasta el vencimiento)
+DIAS_ALERTA_CORTA = 30
+DIAS_PROXIMO_VENCER = 90
+
+# Presentación de cada estado de vencimiento en las tablas de stock
+ESTADOS_VENCIMIENTO = {
+    'vencido': {'clase': 'table-danger', 'badge': 'bg-danger', 'texto': 'Vencido'},
+    'proximo': {'clase': 'table-warning', 'badge': 'bg-warning text-dark', 'texto': 'Próximo a vencer'},
+    'vigente': {'clase': '', 'badge': 'bg-success', 'texto': 'Vigente'},
+    'sin_fecha': {'clase': '', 'badge': 'bg-secondary', 'texto': 'Sin fecha'},
+}
+
+# Resumen precalculado: se recalcula al cargar stock, al cambiar la versión de datos o de día
+_resumen = {'clave': None, 'datos': None}
+_lock = threading.Lock()
+
+
+def expresion_estado_vencimiento(ahora):
+    """
+    Expresión SQL que clasifica cada lote en vencido / proximo / vigente / sin_fecha,
+    para no calcular el estado fila por fila en la plantilla.
+    """
+    return db.case(
+        (Producto.fecha_vencimiento.is_(None), 'sin_fecha'),
+        (Producto.fecha_vencimiento < ahora, 'vencido'),
+        (Producto.fecha_vencimiento < ahora + timedelta(days=DIAS_PROXIMO_VENCER), 'proximo'),
+        else_='vigente'
+    ).label('estado_vencimiento')
+
+
+def _contar_rango(desde=None, hasta=None):
+    """Cuenta lotes de stock con vencimiento en [desde, hasta) usando el índice por fecha."""
+    consulta = db.select(db.func.count()).select_from(Producto).where(Producto.is_master == False)
+    if desde is not None:
+        consulta = consulta.where(Producto.fecha_vencimiento >= desde)
+    else:
+        consulta = consulta.where(Producto.fecha_vencimiento.is_not(None))
+    if hasta is not None:
+        consulta = consulta.where(Producto.fecha_vencimiento < hasta)
+    return db.session.execute(consulta).scalar()
+
+
+def _contar_franjas(ahora):
+    """Cantidad de lotes por franja de vencimiento en el depósito activo."""
+    limite_corto = ahora + timedelta(days=DIAS_ALERTA_CORTA)
+    limite_proximo = ahora + timedelta(days=DIAS_PROXIMO_VENCER)
+
+    sin_fecha = db.session.execute(
+        db.select(db.func.count()).select_from(Producto).where(
+            Producto.is_master == False, Producto.fecha_vencimiento.is_(None)
+        )
+    ).scalar()
+
+    return {
+        'vencidos': _contar_rango(hasta=ahora),
+        'proximos_30': _contar_rango(ahora, limite_corto),
+        'proximos_90': _contar_rango(limite_corto, limite_proximo),
+        'vigentes': _contar_rango(desde=limite_proximo),
+        'sin_fecha': sin_fecha,
+    }
+
+
+def calcular_resumen_vencimientos(ahora=None):
+    """Cuenta los lotes de stock por franja de vencimiento, sumando todos los depósitos."""
+    ahora = ahora or datetime.now()
+    resumen = {}
+    for _, franjas in en_todos(lambda: _contar_franjas(ahora)):
+        for franja, cantidad in franjas.items():
+            resumen[franja] = resumen.get(franja, 0) + cantidad
+    resumen['calculado'] = ahora.strftime('%Y-%m-%d %H:%M')
+    return resumen
+
+
+def refrescar_resumen_vencimientos():
+    """Recalcula el resumen (se llama después de cargar o vaciar stock)."""
+    clave = (version_datos()[0], date.today())
+    datos = calcular_resumen_vencimientos()
+    with _lock:
+        _resumen['clave'] = clave
+        _resumen['datos'] = datos
+    return datos
+
+
+def resumen_vencimientos():
+    """Retorna el resumen precalculado, recalculándolo solo si cambiaron los datos o el día."""
+    clave = (version_datos()[0], date.today())
+    if _resumen['clave'] == clave:
+        return _resumen['datos']
+    return refrescar_resumen_vencimientos()
+
+
+def lotes_por_vencer(dias=DIAS_ALERTA_CORTA, incluir_vencidos=False, limite=None):
+    """
+    Lotes de stock de todos los depósitos que vencen en los próximos `dias` días, ordenados por fecha.
+    En cada depósito es una consulta por rango sobre el índice (is_master, fecha_vencimiento).
+    """
+    ahora = datetime.now()
+    consulta = db.select(
+        Producto.id, Producto.codigo, Producto.nombre, Producto.lote,
+        Producto.cantidad_disponible, Producto.unidad, Producto.fecha_vencimiento
+    ).where(
+        Producto.is_master == False,
+        Producto.fecha_vencimiento < ahora + timedelta(days=dias)
+    ).order_by(Producto.fecha_vencimiento)
+
+    if not incluir_vencidos:
+        consulta = consulta.where(Producto.fecha_vencimiento >= ahora)
+    if limite:
+        consulta = consulta.limit(limite)
+
+    def leer():
+        return [(deposito_actual(), fila) for fila in db.session.execute(consulta)]
+
+    filas = [fila for _, filas in en_todos(leer) for fila in filas]
+    filas.sort(key=lambda deposito_fila: deposito_fila[1].fecha_vencimiento)  # Estable: une los depósitos
+    if limite:
+        filas = filas[:limite]
+
+    return [
+        {
+            'id': fila.id,
+            'deposito': deposito,
+            'codigo': fila.codigo,
+            'nombre': fila.nombre,
+            'lote': fila.lote or 'S/L',
+            'cantidad': fila.cantidad_disponible,
+            'unidad': fila.unidad,
+            'vencimiento': fila.fecha_vencimiento.strftime('%Y-%m-%d'),
+            'dias_restantes': (fila.fecha_vencimiento - ahora).days,
+            'vencido': fila.fecha_vencimiento < ahora,
+        }
+        for deposito, fila in filas
+    ]
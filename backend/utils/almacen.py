@@ -0,0 +1,199 @@
+"""
+Recepción de archivos subidos y almacenamiento por contenido.
+
+Los archivos se reciben en un buffer temporal (en memoria hasta cierto tamaño)
+que calcula el SHA-256 a medida que Werkzeug escribe el upload, y se le pasan
+directo al parser. En la carpeta de uploads se guarda una sola copia por
+contenido (uploads/ab/abcdef....csv) y se eliminan las más viejas según la
+política de retención.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from flask import Request
+
+TAMANO_BLOQUE = 64 * 1024
+# Hasta este tamaño el upload queda en memoria; más grande pasa a un archivo temporal
+MAX_EN_MEMORIA = 32 * 1024 * 1024
+# Temporales de una copia en curso: la retención no los toca hasta que son viejos
+SUFIJO_TEMPORAL = '.tmp'
+EDAD_MINIMA_TEMPORAL = 3600
+# Subcarpetas del almacén: los dos primeros caracteres del SHA-256
+SUBCARPETA = re.compile(r'^[0-9a-f]{2}$')
+
+
+class BufferConHash(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile que calcula el SHA-256 y el tamaño de lo que se le escribe"""
+
+    def __init__(self, max_size=MAX_EN_MEMORIA):
+        super().__init__(max_size=max_size, mode='w+b')
+        self._hash = hashlib.sha256()
+        self.tamano = 0
+
+    def write(self, datos):
+        self._hash.update(datos)
+        self.tamano += len(datos)
+        return super().write(datos)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+
+class PedidoConHash(Request):
+    """Request cuyos archivos subidos se reciben en un BufferConHash"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BufferConHash()
+
+
+@dataclass
+class ArchivoSubido:
+    """Un archivo subido listo para procesar, sin pasar por disco"""
+    nombre: str
+    contenido: object  # Objeto tipo archivo (binario)
+    sha256: str
+    tamano: int
+
+    @classmethod
+    def desde_upload(cls, archivo, nombre):
+        """Arma el ArchivoSubido desde un FileStorage de Werkzeug"""
+        stream = archivo.stream
+        if isinstance(stream, BufferConHash):
+            return cls(nombre, stream, stream.sha256, stream.tamano)
+
+        # Otro tipo de stream (p.ej. un servidor con su propio parser): calcular el hash leyendo
+        h = hashlib.sha256()
+        tamano = 0
+        stream.seek(0)
+        for bloque in iter(lambda: stream.read(TAMANO_BLOQUE), b''):
+            h.update(bloque)
+            tamano += len(bloque)
+        return cls(nombre, stream, h.hexdigest(), tamano)
+
+    @property
+    def extension(self):
+        return os.path.splitext(self.nombre)[1].lower()
+
+    def abrir(self):
+        """El contenido desde el principio (se puede leer varias veces)"""
+        self.contenido.seek(0)
+        return self.contenido
+
+
+def ruta_en_almacen(carpeta, sha256, extension):
+    return os.path.join(carpeta, sha256[:2], f'{sha256}{extension}')
+
+
+def guardar_en_almacen(carpeta, archivo):
+    """
+    Guarda una copia del archivo identificada por su hash.
+    Si ese contenido ya estaba guardado no se escribe de nuevo, solo se renueva
+    su fecha para la retención. Retorna (ruta, es_nuevo).
+    """
+    ruta = ruta_en_almacen(carpeta, archivo.sha256, archivo.extension)
+    if os.path.exists(ruta):
+        os.utime(ruta, None)
+        return ruta, False
+
+    # Copia a un temporal y rename atómico: dos uploads iguales a la vez no se pisan
+    descriptor, temporal = _crear_temporal(os.path.dirname(ruta))
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            shutil.copyfileobj(archivo.abrir(), destino, TAMANO_BLOQUE)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return ruta, True
+
+
+def _crear_temporal(directorio):
+    """mkstemp en la subcarpeta del almacén, creándola si hace falta"""
+    for intento in range(2):
+        os.makedirs(directorio, exist_ok=True)
+        try:
+            return tempfile.mkstemp(dir=directorio, suffix=SUFIJO_TEMPORAL)
+        except FileNotFoundError:
+            # La retención borró la subcarpeta vacía justo entre makedirs y mkstemp
+            if intento:
+                raise
+
+
+def _subcarpetas(carpeta):
+    """Subcarpetas del almacén por contenido (uploads/ab/); lo demás de la carpeta no se toca"""
+    try:
+        nombres = os.listdir(carpeta)
+    except OSError:
+        return []
+    return [
+        os.path.join(carpeta, nombre) for nombre in nombres
+        if SUBCARPETA.match(nombre) and os.path.isdir(os.path.join(carpeta, nombre))
+    ]
+
+
+def aplicar_retencion(carpeta, max_archivos=None, max_bytes=None, max_dias=None):
+    """
+    Elimina de la carpeta de uploads los archivos subidos hace más tiempo
+    (por última subida) hasta cumplir los límites de cantidad, tamaño total y antigüedad.
+    Un límite en None o 0 no se aplica. Retorna la cantidad de archivos eliminados.
+    Solo cuenta las subcarpetas por contenido: los archivos que versiones anteriores
+    guardaban sueltos en uploads/<nombre> quedan como están.
+    """
+    ahora = time.time()
+    archivos = []
+    for subcarpeta in _subcarpetas(carpeta):
+        try:
+            nombres = os.listdir(subcarpeta)
+        except OSError:
+            continue
+        for nombre in nombres:
+            ruta = os.path.join(subcarpeta, nombre)
+            if not os.path.isfile(ruta):
+                continue
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            if nombre.endswith(SUFIJO_TEMPORAL) and ahora - estado.st_mtime < EDAD_MINIMA_TEMPORAL:
+                continue
+            archivos.append((estado.st_mtime, estado.st_size, ruta))
+
+    # Del más reciente al más viejo: se conservan los primeros que entran en los límites
+    archivos.sort(reverse=True)
+    limite_fecha = ahora - max_dias * 86400 if max_dias else None
+    conservados = 0
+    total = 0
+    eliminados = 0
+    for modificado, tamano, ruta in archivos:
+        excede = (
+            (max_archivos and conservados >= max_archivos)
+            or (max_bytes and total + tamano > max_bytes)
+            or (limite_fecha is not None and modificado < limite_fecha)
+        )
+        if excede:
+            try:
+                os.remove(ruta)
+                eliminados += 1
+                continue
+            except OSError:
+                pass
+        conservados += 1
+        total += tamano
+
+    _eliminar_subcarpetas_vacias(carpeta)
+    return eliminados
+
+
+def _eliminar_subcarpetas_vacias(carpeta):
+    """Borra las subcarpetas (uploads/ab/) que quedaron sin archivos"""
+    for subcarpeta in _subcarpetas(carpeta):
+        try:
+            os.rmdir(subcarpeta)  # Solo funciona si está vacía
+        except OSError:
+            pass
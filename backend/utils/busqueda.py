@@ -0,0 +1,173 @@
+from itertools import islice, zip_longest
+from sqlalchemy import event, text
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db, motor_deposito
+from utils.depositos import en_todos, DEPOSITO_PRINCIPAL
+
+# Índice FTS5 único para productos y recetas. El rowid codifica el origen
+# (id * 2 para productos, id * 2 + 1 para recetas), así los triggers borran
+# por rowid sin recorrer la tabla.
+DDL_INDICE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+        codigo, nombre, lote, tipo,
+        ref_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '1 2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_productos_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO busqueda(rowid, codigo, nombre, lote, tipo, ref_id)
+        VALUES (new.id * 2, new.codigo, new.nombre, coalesce(new.lote, ''), 'producto', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_productos_ad AFTER DELETE ON productos BEGIN
+        DELETE FROM busqueda WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_productos_au AFTER UPDATE OF codigo, nombre, lote ON productos BEGIN
+        DELETE FROM busqueda WHERE rowid = old.id * 2;
+        INSERT INTO busqueda(rowid, codigo, nombre, lote, tipo, ref_id)
+        VALUES (new.id * 2, new.codigo, new.nombre, coalesce(new.lote, ''), 'producto', new.id);
+    END
+    """,
+]
+
+# Solo en la base principal: los depósitos no tienen recetas
+DDL_INDICE_RECETAS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_recetas_ai AFTER INSERT ON recetas BEGIN
+        INSERT INTO busqueda(rowid, codigo, nombre, lote, tipo, ref_id)
+        VALUES (new.id * 2 + 1, new.codigo, new.nombre, '', 'receta', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_recetas_ad AFTER DELETE ON recetas BEGIN
+        DELETE FROM busqueda WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_recetas_au AFTER UPDATE OF codigo, nombre ON recetas BEGIN
+        DELETE FROM busqueda WHERE rowid = old.id * 2 + 1;
+        INSERT INTO busqueda(rowid, codigo, nombre, lote, tipo, ref_id)
+        VALUES (new.id * 2 + 1, new.codigo, new.nombre, '', 'receta', new.id);
+    END
+    """,
+]
+
+RECONSTRUIR_INDICE = [
+    "DELETE FROM busqueda",
+    """
+    INSERT INTO busqueda(rowid, codigo, nombre, lote, tipo, ref_id)
+    SELECT id * 2, codigo, nombre, coalesce(lote, ''), 'producto', id FROM productos
+    """,
+]
+RECONSTRUIR_INDICE_RECETAS = [
+    """
+    INSERT INTO busqueda(rowid, codigo, nombre, lote, tipo, ref_id)
+    SELECT id * 2 + 1, codigo, nombre, '', 'receta', id FROM recetas
+    """,
+]
+
+# Peso de cada columna en el ranking bm25: el código pesa más que el nombre y el lote.
+# tipo está indexado solo para filtrar dentro del MATCH y no suma relevancia.
+PESOS_BM25 = '10.0, 4.0, 1.0, 0.0'
+# Con prefijos más cortos casi todo coincide y ordenar por bm25 cuesta más que ayuda
+LARGO_MINIMO_RANKING = 3
+
+
+def crear_indice_busqueda(conexion, con_recetas=True):
+    """
+    Crea la tabla FTS5 y sus triggers si no existen. Si el índice es nuevo
+    se llena con los productos y recetas que ya estaban en la base.
+    Los archivos de depósitos (utils/depositos.py) usan `con_recetas=False`.
+    """
+    existia = conexion.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busqueda'")
+    ).first() is not None
+
+    for sentencia in DDL_INDICE + (DDL_INDICE_RECETAS if con_recetas else []):
+        conexion.execute(text(sentencia))
+
+    if not existia:
+        reconstruir_indice_busqueda(conexion, con_recetas)
+
+
+def reconstruir_indice_busqueda(conexion, con_recetas=True):
+    """Vuelve a generar el índice completo desde las tablas."""
+    for sentencia in RECONSTRUIR_INDICE + (RECONSTRUIR_INDICE_RECETAS if con_recetas else []):
+        conexion.execute(text(sentencia))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _crear_indice_despues_de_tablas(metadata, conexion, **kwargs):
+    crear_indice_busqueda(conexion)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _eliminar_indice_antes_de_tablas(metadata, conexion, **kwargs):
+    conexion.execute(text("DROP TABLE IF EXISTS busqueda"))
+
+
+def _terminos(texto):
+    """Separa lo que escribe el usuario en palabras, escapando las comillas."""
+    return [t.replace('"', '""') for t in texto.split() if t.strip('"')]
+
+
+def buscar(texto, tipo=None, limite=20):
+    """
+    Busca productos y recetas por código, nombre o lote con coincidencia de prefijo,
+    ordenados por relevancia (salvo prefijos muy cortos). `tipo` puede ser 'producto' o 'receta'.
+    Cada depósito tiene su propio índice con sus lotes. Los puntajes bm25 de distintos índices
+    no se pueden comparar, así que cada depósito se ordena por separado y los resultados se
+    intercalan (el primero de cada depósito, después el segundo, ...). Los ids solo son únicos
+    dentro de un depósito: cada resultado trae el nombre del suyo.
+    """
+    terminos = _terminos(texto or '')
+    if not terminos:
+        return []
+
+    # Cada palabra se cita (para que no se interprete como operador) y se busca como prefijo
+    # en código, nombre o lote. El filtro por tipo va dentro del MATCH para usar el índice.
+    consulta = ' '.join(f'{{codigo nombre lote}} : "{t}"*' for t in terminos)
+    if tipo:
+        consulta = f'tipo : "{tipo}" AND {consulta}'
+
+    orden = ''
+    if max(len(t) for t in terminos) >= LARGO_MINIMO_RANKING:
+        orden = f'ORDER BY bm25(busqueda, {PESOS_BM25})'
+    sql = f"""
+        SELECT tipo, ref_id, codigo, nombre, lote
+        FROM busqueda
+        WHERE busqueda MATCH :consulta
+        {orden}
+        LIMIT :limite
+    """
+    parametros = {'consulta': consulta, 'limite': limite}
+
+    def leer():
+        # text() no nombra tablas: se indica a mano la base del depósito activo
+        motor = motor_deposito.get()
+        return db.session.execute(
+            text(sql), parametros, bind_arguments={'bind': motor} if motor is not None else None
+        ).all()
+
+    # Las recetas solo están en la base principal
+    por_deposito = en_todos(leer, [DEPOSITO_PRINCIPAL] if tipo == 'receta' else None)
+    intercaladas = (
+        (deposito, fila)
+        for puesto in zip_longest(*(filas for _, filas in por_deposito))
+        for (deposito, _), fila in zip(por_deposito, puesto)
+        if fila is not None
+    )
+
+    return [
+        {'tipo': fila.tipo, 'id': fila.ref_id, 'deposito': deposito, 'codigo': fila.codigo,
+         'nombre': fila.nombre, 'lote': fila.lote or None}
+        for deposito, fila in islice(intercaladas, limite)
+    ]
@@ -0,0 +1,71 @@
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# Versiones por receta: cambian cada vez que una carga modifica la receta
+_versiones_recetas = {}
+# Fragmentos HTML ya renderizados: receta_id -> (version, html)
+_fragmentos_recetas = {}
+# Generación global: se incrementa al invalidar todo, así ninguna versión vieja se reutiliza
+_generacion_recetas = 0
+_lock = threading.Lock()
+
+# Versión global de los datos: la incrementan las cargas y los endpoints de mantenimiento.
+# El token del proceso evita que un ETag de una ejecución anterior coincida por casualidad.
+_token_proceso = uuid.uuid4().hex[:8]
+_version_datos = 0
+_ultima_modificacion = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def version_receta(receta_id):
+    """Retorna la versión actual de los datos de una receta."""
+    return (_generacion_recetas, _versiones_recetas.get(receta_id, 0))
+
+
+def marcar_recetas_modificadas(receta_ids):
+    """
+    Incrementa la versión de las recetas indicadas para que sus fragmentos
+    se vuelvan a renderizar en la próxima visita a /recetas.
+    """
+    with _lock:
+        for receta_id in receta_ids:
+            _versiones_recetas[receta_id] = _versiones_recetas.get(receta_id, 0) + 1
+
+
+def invalidar_recetas():
+    """Descarta todos los fragmentos (vaciado, reseteo o cambio de nombres de productos)."""
+    global _generacion_recetas
+    with _lock:
+        _generacion_recetas += 1
+        _fragmentos_recetas.clear()
+        _versiones_recetas.clear()
+
+
+def obtener_fragmento_receta(receta_id):
+    """Retorna el HTML cacheado de la receta si sigue vigente, o None."""
+    cacheado = _fragmentos_recetas.get(receta_id)
+    if cacheado and cacheado[0] == version_receta(receta_id):
+        return cacheado[1]
+    return None
+
+
+def guardar_fragmento_receta(receta_id, version, html):
+    """
+    Guarda el HTML renderizado de la receta. La versión debe leerse antes de
+    consultar la base, así una carga concurrente no deja un fragmento viejo vigente.
+    """
+    with _lock:
+        _fragmentos_recetas[receta_id] = (version, html)
+
+
+def incrementar_version_datos():
+    """Marca que los datos cambiaron (cargas, vaciados, reseteo)."""
+    global _version_datos, _ultima_modificacion
+    with _lock:
+        _version_datos += 1
+        _ultima_modificacion = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def version_datos():
+    """Retorna (etag, ultima_modificacion) de los datos actuales."""
+    return f'{_token_proceso}-{_version_datos}', _ultima_modificacion
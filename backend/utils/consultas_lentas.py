@@ -0,0 +1,187 @@
+"""
+Registro de consultas lentas: cada sentencia SQL que supera el umbral se guarda,
+con sus parámetros, quién la ejecutó y el resultado de EXPLAIN QUERY PLAN,
+en un buffer circular que se consulta desde /consultas-lentas.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metricas import usar_conexiones_medidas, ruta_en_curso
+
+UMBRAL_MS_POR_DEFECTO = None  # Desactivado salvo que se configure un umbral
+MAXIMO_POR_DEFECTO = 200
+LARGO_MAXIMO_PARAMETROS = 500
+
+# Sentencias sobre las que tiene sentido pedir el plan
+_PREFIJOS_CON_PLAN = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+_DIR_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Módulos de la medición: el origen es quien los llamó
+_ARCHIVOS_PROPIOS = {os.path.abspath(__file__), os.path.join(_DIR_BACKEND, 'utils', 'metricas.py')}
+
+_config = {'umbral_s': None}
+_registros = deque(maxlen=MAXIMO_POR_DEFECTO)
+_lock = threading.Lock()
+
+
+def _origen_en_codigo():
+    """Función de la app (no de SQLAlchemy ni de la medición) que ejecutó o leyó la sentencia"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        archivo = frame.f_code.co_filename
+        # '<string>' y similares: código generado por SQLAlchemy
+        archivo = None if archivo.startswith('<') else os.path.abspath(archivo)
+        if archivo and archivo.startswith(_DIR_BACKEND) and archivo not in _ARCHIVOS_PROPIOS:
+            return f'{frame.f_code.co_name} ({os.path.relpath(archivo, _DIR_BACKEND)}:{frame.f_lineno})'
+        frame = frame.f_back
+    return None
+
+
+def _plan(conexion, statement, parameters):
+    """Filas de EXPLAIN QUERY PLAN de la sentencia, con los mismos parámetros"""
+    try:
+        # Cursor propio, para no mezclar sus filas con el cursor de la consulta
+        explicacion = sqlite3.Cursor(conexion)
+        explicacion.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        filas = explicacion.fetchall()
+        explicacion.close()
+    except sqlite3.Error as e:
+        return [f'(no se pudo obtener el plan: {e})']
+    return [detalle for _, _, _, detalle in filas]
+
+
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('consultas_inicio', []).append(time.perf_counter())
+
+
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('consultas_inicio')
+    if not inicios:
+        return
+    inicio = inicios.pop()
+    if _config['umbral_s'] is None:
+        return
+
+    ruta = ruta_en_curso()
+    con_plan = conn.dialect.name == 'sqlite' and statement.lstrip().upper().startswith(_PREFIJOS_CON_PLAN)
+    if cursor.description is not None and hasattr(cursor, 'al_terminar'):
+        # Devuelve filas: sqlite3 hace el resto del trabajo mientras se leen, así que
+        # se mide hasta que el cursor se agota o se cierra (ver utils/metricas.py)
+        conexion = cursor.connection
+        cursor.al_terminar = lambda: _registrar_si_lenta(
+            conexion, inicio, statement, parameters, executemany, ruta, con_plan
+        )
+        return
+    _registrar_si_lenta(cursor.connection, inicio, statement, parameters, executemany, ruta, con_plan)
+
+
+def _registrar_si_lenta(conexion, inicio, statement, parameters, executemany, ruta, con_plan):
+    duracion = time.perf_counter() - inicio
+    umbral = _config['umbral_s']
+    if umbral is None or duracion < umbral:
+        return
+
+    # En un executemany se usa el primer juego de parámetros para el plan
+    parametros_plan = parameters[0] if executemany and parameters else parameters
+    plan = _plan(conexion, statement, parametros_plan) if con_plan else None
+
+    parametros = repr(parameters)
+    if len(parametros) > LARGO_MAXIMO_PARAMETROS:
+        parametros = parametros[:LARGO_MAXIMO_PARAMETROS] + '…'
+
+    registro = {
+        'fecha': datetime.now(),
+        'duracion_ms': duracion * 1000,
+        'sentencia': statement,
+        'parametros': parametros,
+        'filas_afectadas': len(parameters) if executemany else None,
+        'ruta': ruta,
+        'funcion': _origen_en_codigo(),
+        'plan': plan,
+        'recorre_tabla': any(_es_recorrido_completo(paso) for paso in plan or ()),
+    }
+    with _lock:
+        _registros.append(registro)
+
+
+def _error_en_sentencia(contexto):
+    # La sentencia falló: descartar su inicio para no desfasar las siguientes
+    if contexto.connection is not None:
+        inicios = contexto.connection.info.get('consultas_inicio')
+        if inicios:
+            inicios.pop()
+
+
+def _es_recorrido_completo(detalle):
+    """True si el paso del plan recorre una tabla entera (SCAN sin índice)"""
+    return detalle.startswith('SCAN ') and 'USING' not in detalle and 'VIRTUAL TABLE' not in detalle
+
+
+def consultas_lentas():
+    """Consultas registradas, de la más reciente a la más antigua"""
+    with _lock:
+        return list(reversed(_registros))
+
+
+def resumen_por_sentencia(registros):
+    """Agrupa los registros por sentencia: cantidad, tiempo máximo y promedio, último plan"""
+    grupos = {}
+    for registro in registros:
+        grupo = grupos.get(registro['sentencia'])
+        if grupo is None:
+            grupo = grupos[registro['sentencia']] = {
+                'sentencia': registro['sentencia'],
+                'cantidad': 0,
+                'total_ms': 0.0,
+                'maximo_ms': 0.0,
+                'plan': registro['plan'],
+                'recorre_tabla': registro['recorre_tabla'],
+                'funcion': registro['funcion'],
+            }
+        grupo['cantidad'] += 1
+        grupo['total_ms'] += registro['duracion_ms']
+        grupo['maximo_ms'] = max(grupo['maximo_ms'], registro['duracion_ms'])
+    for grupo in grupos.values():
+        grupo['promedio_ms'] = grupo['total_ms'] / grupo['cantidad']
+    return sorted(grupos.values(), key=lambda g: g['total_ms'], reverse=True)
+
+
+def vaciar_consultas_lentas():
+    with _lock:
+        _registros.clear()
+
+
+def umbral_ms():
+    """Umbral actual en milisegundos, o None si el registro está desactivado"""
+    return None if _config['umbral_s'] is None else _config['umbral_s'] * 1000
+
+
+def registrar_consultas_lentas(app):
+    """
+    Activa el registro según CONSULTAS_LENTAS_MS (umbral en ms; None o negativo lo desactiva)
+    y CONSULTAS_LENTAS_MAXIMO (tamaño del buffer circular). Desactivado no instala los
+    cursores medidos ni los eventos, así que no cuesta nada.
+    """
+    global _registros
+    umbral = app.config.get('CONSULTAS_LENTAS_MS', UMBRAL_MS_POR_DEFECTO)
+    if umbral is None or umbral < 0:
+        return
+
+    # Cursores que avisan al terminar de leer: así se mide también la lectura de las filas
+    usar_conexiones_medidas(app)
+
+    maximo = app.config.get('CONSULTAS_LENTAS_MAXIMO', MAXIMO_POR_DEFECTO)
+    with _lock:
+        _registros = deque(_registros, maxlen=maximo)
+    _config['umbral_s'] = umbral / 1000
+
+    if not event.contains(Engine, 'before_cursor_execute', _antes_de_sentencia):
+        event.listen(Engine, 'before_cursor_execute', _antes_de_sentencia)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_sentencia)
+        event.listen(Engine, 'handle_error', _error_en_sentencia)
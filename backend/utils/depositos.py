@@ -0,0 +1,165 @@
+"""
+Stock particionado por depósito (almacén o sede).
+
+El depósito 'principal' es la base de siempre. Cada depósito adicional es un
+archivo SQLite en la carpeta de depósitos (depositos/<nombre>.db, junto a la
+base principal) con sus propias tablas de stock: lotes, libro de movimientos y
+puntos de control. Las recetas, los productos maestros y el historial de
+importaciones quedan en la base principal.
+
+Los archivos se abren la primera vez que se usan y cada uno tiene su motor,
+así las cargas de distintos depósitos no compiten por el mismo bloqueo de
+escritura y las lecturas de stock se reparten en un pool de threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import re
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import current_app
+from sqlalchemy import create_engine, make_url
+from models import db, motor_deposito, asegurar_indices, TABLAS_STOCK
+from utils.metricas import pedido_en_curso, ruta_en_curso, continuar_medicion
+
+DEPOSITO_PRINCIPAL = 'principal'
+EXTENSION = '.db'
+NOMBRE_VALIDO = re.compile(r'^[A-Za-z0-9_-]{1,40}$')
+# Threads para leer los depósitos en paralelo
+HILOS = int(os.environ.get('APPLAB_HILOS_DEPOSITOS', 4))
+
+_deposito_activo = ContextVar('deposito_activo', default=DEPOSITO_PRINCIPAL)
+_motores = {}  # ruta del archivo -> Engine
+_lock = threading.Lock()
+_pool = None
+
+
+def carpeta_por_defecto(uri, instance_path):
+    """Carpeta de depósitos junto a la base principal (o en instance/ si no es un archivo SQLite)"""
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), 'depositos')
+    return os.path.join(instance_path, 'depositos')
+
+
+def _carpeta():
+    return current_app.config['DEPOSITOS_DIR']
+
+
+def validar_nombre(nombre):
+    """Retorna el nombre del depósito sin espacios, o lanza ValueError si no sirve como nombre de archivo"""
+    nombre = (nombre or '').strip() or DEPOSITO_PRINCIPAL
+    if not NOMBRE_VALIDO.match(nombre):
+        raise ValueError('Nombre de depósito inválido: usar letras, números, "-" o "_" (hasta 40)')
+    return nombre
+
+
+def depositos():
+    """Nombres de los depósitos: primero el principal y después los demás por nombre"""
+    try:
+        archivos = os.listdir(_carpeta())
+    except OSError:
+        archivos = []
+    nombres = sorted(
+        nombre[:-len(EXTENSION)] for nombre in archivos
+        if nombre.endswith(EXTENSION) and NOMBRE_VALIDO.match(nombre[:-len(EXTENSION)])
+    )
+    return [DEPOSITO_PRINCIPAL] + [nombre for nombre in nombres if nombre != DEPOSITO_PRINCIPAL]
+
+
+def deposito_actual():
+    return _deposito_activo.get()
+
+
+def _motor(nombre):
+    """Motor del archivo del depósito; la primera vez crea el archivo y sus tablas de stock"""
+    ruta = os.path.join(_carpeta(), f'{nombre}{EXTENSION}')
+    with _lock:
+        motor = _motores.get(ruta)
+        if motor is None:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Mismas opciones que la base principal (p.ej. las conexiones medidas de /metrics)
+            opciones = dict(current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+            motor = create_engine(f'sqlite:///{ruta}', **opciones)
+            # Tabla por tabla: create_all dispararía el índice de búsqueda, que usa tablas de la principal
+            for tabla in db.metadata.sorted_tables:
+                if tabla.name in TABLAS_STOCK:
+                    tabla.create(motor, checkfirst=True)
+            asegurar_indices(motor, TABLAS_STOCK)
+            # Índice de búsqueda propio con los lotes del depósito
+            from utils.busqueda import crear_indice_busqueda  # busqueda importa este módulo
+            with motor.begin() as conexion:
+                crear_indice_busqueda(conexion, con_recetas=False)
+            _motores[ruta] = motor
+        return motor
+
+
+@contextmanager
+def en_deposito(nombre):
+    """
+    Dentro del bloque, las tablas de stock de db.session son las del depósito.
+    La sesión se cierra al entrar y al salir para no mezclar filas de distintas bases
+    (los ids se repiten entre depósitos): lo que no se haya confirmado se descarta.
+    """
+    nombre = validar_nombre(nombre)
+    if nombre == deposito_actual():
+        yield
+        return
+    motor = None if nombre == DEPOSITO_PRINCIPAL else _motor(nombre)
+    anteriores = (motor_deposito.get(), _deposito_activo.get())
+    db.session.close()
+    motor_deposito.set(motor)
+    _deposito_activo.set(nombre)
+    try:
+        yield
+    finally:
+        db.session.close()
+        # set y no reset: en una exportación por streaming el generador puede cerrarse desde otro contexto
+        motor_deposito.set(anteriores[0])
+        _deposito_activo.set(anteriores[1])
+
+
+def _pool_hilos():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, HILOS), thread_name_prefix='deposito')
+        return _pool
+
+
+def en_todos(funcion, nombres=None):
+    """
+    [(deposito, funcion())] para cada depósito. Con un solo depósito se corre acá mismo;
+    con varios, cada uno en un thread del pool con su propio contexto y sesión.
+    """
+    nombres = depositos() if nombres is None else [validar_nombre(nombre) for nombre in nombres]
+    if nombres == [deposito_actual()]:
+        return [(nombres[0], funcion())]
+
+    app = current_app._get_current_object()
+    # Las sentencias de los threads se suman a las métricas y al registro de consultas lentas del pedido
+    pedido, ruta = pedido_en_curso(), ruta_en_curso()
+
+    def correr(nombre):
+        with app.app_context(), continuar_medicion(pedido, ruta), en_deposito(nombre):
+            return funcion()
+
+    return list(zip(nombres, _pool_hilos().map(correr, nombres)))
+
+
+def eliminar_depositos():
+    """Cierra y borra los archivos de todos los depósitos salvo el principal. Retorna cuántos borró."""
+    with _lock:
+        for motor in _motores.values():
+            motor.dispose()
+        _motores.clear()
+    eliminados = 0
+    for nombre in depositos()[1:]:
+        try:
+            os.remove(os.path.join(_carpeta(), f'{nombre}{EXTENSION}'))
+            eliminados += 1
+        except OSError:
+            pass
+    return eliminados
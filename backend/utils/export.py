@@ -0,0 +1,135 @@
+import csv
+import io
+import tempfile
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db, Producto, Receta, RecetaComponente
+from utils.depositos import depositos, en_deposito
+
+# Cantidad de filas que se traen de la base por cada lectura del cursor
+FILAS_POR_LOTE = 1000
+# Tamaño aproximado (en caracteres) de cada bloque enviado al cliente
+TAMANO_BLOQUE_CSV = 64 * 1024
+
+COLUMNAS_STOCK = ['codigo', 'nombre', 'lote', 'cantidad', 'unidad', 'vencimiento', 'deposito']
+COLUMNAS_RECETAS = ['receta_codigo', 'receta_nombre', 'producto_codigo',
+                    'producto_nombre', 'cantidad', 'unidad']
+COLUMNAS_PRODUCCION = ['producto', 'necesario', 'disponible', 'faltante', 'estado',
+                       'lote', 'cantidad_lote', 'cantidad_a_usar', 'vencimiento',
+                       'vencido', 'proximo_vencer']
+
+
+def _formatear_fecha(fecha):
+    return fecha.strftime('%Y-%m-%d') if fecha else ''
+
+
+def _lotes_stock():
+    """
+    Recorre los lotes de stock del depósito activo con un cursor del lado del servidor.
+    Solo se seleccionan columnas, sin construir objetos Producto.
+    """
+    consulta = db.select(
+        Producto.codigo, Producto.nombre, Producto.lote,
+        Producto.cantidad_disponible, Producto.unidad, Producto.fecha_vencimiento
+    ).where(Producto.is_master == False).order_by(Producto.codigo, Producto.fecha_vencimiento)
+
+    resultado = db.session.execute(consulta.execution_options(yield_per=FILAS_POR_LOTE))
+    for codigo, nombre, lote, cantidad, unidad, vencimiento in resultado:
+        yield [codigo, nombre, lote or '', cantidad, unidad, _formatear_fecha(vencimiento)]
+
+
+def filas_stock():
+    """Lotes de stock de todos los depósitos, uno después del otro, siempre por streaming"""
+    for deposito in depositos():
+        with en_deposito(deposito):
+            for fila in _lotes_stock():
+                yield fila + [deposito]
+
+
+def filas_recetas():
+    """
+    Recorre las recetas con sus componentes (una fila por componente)
+    con un cursor del lado del servidor.
+    """
+    consulta = db.select(
+        Receta.codigo, Receta.nombre, Producto.codigo, Producto.nombre,
+        RecetaComponente.cantidad_necesaria, RecetaComponente.unidad
+    ).join(RecetaComponente, RecetaComponente.receta_id == Receta.id
+    ).join(Producto, Producto.id == RecetaComponente.producto_id
+    ).order_by(Receta.codigo, RecetaComponente.id)
+
+    resultado = db.session.execute(consulta.execution_options(yield_per=FILAS_POR_LOTE))
+    for fila in resultado:
+        yield list(fila)
+
+
+def filas_produccion(resultado):
+    """
+    Aplana el resultado de calcular_produccion_recetas en una fila por lote.
+    Los productos sin lotes en stock generan una sola fila sin datos de lote.
+    """
+    for detalle in resultado['detalles']:
+        base = [
+            detalle['producto'],
+            detalle['necesario'],
+            detalle['disponible'],
+            detalle.get('faltante', 0),
+            detalle['estado'],
+        ]
+        if not detalle['lotes']:
+            yield base + ['', '', '', '', '', '']
+            continue
+        for lote in detalle['lotes']:
+            yield base + [
+                lote['lote'],
+                lote['cantidad_total'],
+                lote['cantidad'],
+                lote['vencimiento'],
+                'si' if lote['vencido'] else 'no',
+                'si' if lote['proximo_vencer'] else 'no',
+            ]
+
+
+def generar_csv(columnas, filas):
+    """
+    Generador que produce el CSV en bloques para usarlo en una respuesta
+    en streaming. Incluye BOM para que Excel detecte UTF-8.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    writer.writerow(columnas)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    for fila in filas:
+        writer.writerow(fila)
+        if buffer.tell() >= TAMANO_BLOQUE_CSV:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def generar_xlsx(columnas, filas, titulo='Datos'):
+    """
+    Escribe las filas en un libro XLSX en modo solo escritura (memoria constante)
+    y retorna un archivo temporal posicionado al inicio, listo para enviarse.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=titulo)
+    hoja.append(columnas)
+    for fila in filas:
+        hoja.append(fila)
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
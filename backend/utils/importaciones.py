@@ -0,0 +1,202 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import current_app
+from models import db, Importacion
+
+# Etapas de una carga, en el orden en que ocurren
+ETAPAS = ('lectura', 'limpieza', 'resolucion', 'escritura', 'commit')
+NOMBRES_ETAPAS = {
+    'lectura': 'Lectura',
+    'limpieza': 'Limpieza / parseo',
+    'resolucion': 'Resolución de productos',
+    'escritura': 'Escritura en la base',
+    'commit': 'Commit',
+}
+TAMANO_BLOQUE_HASH = 1024 * 1024
+INTERVALO_MEMORIA = 0.05  # Segundos entre muestras de memoria durante una carga
+
+
+def memoria_residente():
+    """
+    Memoria residente (RSS) actual del proceso en bytes, o None si no se puede leer.
+    Se muestrea en vez de usar tracemalloc, que hace varias veces más lenta la carga.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ContadoresMemoria(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (nombre, ctypes.c_size_t) for nombre in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                    'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                    'PagefileUsage', 'PeakPagefileUsage',
+                )
+            ]
+
+        contadores = ContadoresMemoria()
+        contadores.cb = ctypes.sizeof(contadores)
+        proceso = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(proceso, ctypes.byref(contadores), contadores.cb):
+            return contadores.WorkingSetSize
+    return None
+
+
+class _MuestreoMemoria:
+    """Thread que guarda el máximo de memoria residente hasta que se detiene"""
+
+    def __init__(self):
+        self.pico = memoria_residente()
+        self._detener = threading.Event()
+        self._thread = None
+        if self.pico is not None:
+            self._thread = threading.Thread(target=self._muestrear, daemon=True)
+            self._thread.start()
+
+    def _muestrear(self):
+        while not self._detener.wait(INTERVALO_MEMORIA):
+            self._actualizar()
+
+    def _actualizar(self):
+        actual = memoria_residente()
+        if actual is not None and actual > self.pico:
+            self.pico = actual
+
+    def detener(self):
+        if self._thread is not None:
+            self._detener.set()
+            self._thread.join()
+            self._actualizar()
+        return self.pico
+
+
+def hash_archivo(ruta):
+    """SHA-256 del archivo, leído por bloques para no cargarlo entero en memoria"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def lector_para(nombre):
+    """Nombre del lector que usa pandas según la extensión del archivo"""
+    nombre = nombre.lower()
+    if nombre.endswith('.xls'):
+        return 'xlrd'
+    if nombre.endswith('.xlsx'):
+        return 'openpyxl'
+    return 'csv'
+
+
+def nombre_archivo(archivo):
+    """Nombre de un archivo a importar: una ruta o un ArchivoSubido"""
+    return os.path.basename(archivo) if isinstance(archivo, str) else archivo.nombre
+
+
+class RegistroImportacion:
+    """
+    Mide una carga de archivo: tiempo por etapa, filas y pico de memoria residente del proceso.
+    Se usa como context manager; al salir guarda una Importacion, también si la carga falló.
+    Un registro que no se usa con `with` mide igual pero no guarda nada.
+    `archivo` es una ruta o un ArchivoSubido (que ya trae su hash y tamaño).
+    La Importacion va siempre a la base principal y se confirma después de los commits de la
+    carga, aunque esta escriba en otro depósito: si no se puede guardar queda en el log.
+    """
+
+    def __init__(self, tipo, archivo):
+        self.tipo = tipo
+        self.archivo = archivo
+        self.nombre = nombre_archivo(archivo)
+        self.lector = lector_para(self.nombre)
+        self.tiempos = dict.fromkeys(ETAPAS, 0.0)
+        self.filas_leidas = 0
+        self.filas_validas = 0
+        self.registros_creados = 0
+        self.registros_actualizados = 0
+        self._inicio = None
+        self._fecha = None
+        self._memoria = None
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Suma al tiempo de la etapa lo que tarda el bloque (se puede entrar varias veces)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] += time.perf_counter() - inicio
+
+    def __enter__(self):
+        self._fecha = datetime.now()
+        self._inicio = time.perf_counter()
+        self._memoria = _MuestreoMemoria()
+        return self
+
+    def __exit__(self, tipo_error, error, traceback):
+        total = time.perf_counter() - self._inicio
+        memoria_pico = self._memoria.detener()
+
+        if error is not None:
+            # Descartar lo que quedó a medio cargar antes de guardar el registro
+            db.session.rollback()
+
+        if isinstance(self.archivo, str):
+            try:
+                tamano = os.path.getsize(self.archivo)
+                hash_sha256 = hash_archivo(self.archivo)
+            except OSError:
+                tamano = hash_sha256 = None
+        else:
+            tamano, hash_sha256 = self.archivo.tamano, self.archivo.sha256
+
+        try:
+            db.session.add(Importacion(
+                fecha=self._fecha,
+                tipo=self.tipo,
+                archivo=self.nombre,
+                hash_sha256=hash_sha256,
+                tamano_bytes=tamano,
+                lector=self.lector,
+                exito=error is None,
+                error=str(error) if error is not None else None,
+                seg_lectura=self.tiempos['lectura'],
+                seg_limpieza=self.tiempos['limpieza'],
+                seg_resolucion=self.tiempos['resolucion'],
+                seg_escritura=self.tiempos['escritura'],
+                seg_commit=self.tiempos['commit'],
+                seg_total=total,
+                filas_leidas=self.filas_leidas,
+                filas_validas=self.filas_validas,
+                registros_creados=self.registros_creados,
+                registros_actualizados=self.registros_actualizados,
+                memoria_pico_bytes=memoria_pico,
+            ))
+            db.session.commit()
+        except Exception:
+            # El historial nunca debe hacer fallar (ni tapar el error de) una carga
+            db.session.rollback()
+            current_app.logger.exception(
+                'No se pudo guardar el registro de importación de %s (sha256 %s)', self.nombre, hash_sha256
+            )
+        return False
+
+
+def historial_importaciones(tipo=None, limite=50):
+    """Últimas importaciones, de la más reciente a la más antigua"""
+    consulta = db.select(Importacion).order_by(Importacion.fecha.desc(), Importacion.id.desc())
+    if tipo:
+        consulta = consulta.filter_by(tipo=tipo)
+    return db.session.execute(consulta.limit(limite)).scalars().all()
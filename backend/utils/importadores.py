@@ -0,0 +1,499 @@
+"""
+Registro de importadores: cada formato de archivo de origen es un plugin.
+
+Para importar un archivo se leen solo sus primeras filas (la muestra) y se le
+pregunta a cada formato registrado para ese tipo de carga si lo reconoce; el
+formato devuelve una Deteccion con la fila de encabezado y el mapa de columnas
+(campo -> posición). Las detecciones se guardan en memoria por firma del origen
+(tipo, extensión, cantidad de columnas y la huella del encabezado), así los
+archivos siguientes del mismo ERP solo verifican la muestra y pasan directo a
+la lectura completa, que lee únicamente las columnas del mapa.
+
+Para agregar un formato: una subclase de Formato con `tipo`, `nombre`,
+`detectar` y `leer`, decorada con @registrar_formato.
+"""
+import re
+import threading
+from collections import OrderedDict, Counter
+from dataclasses import dataclass
+from typing import Dict, Tuple
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.importaciones import nombre_archivo
+from utils.unidades import a_canonica
+
+# Filas que se leen para detectar el formato
+FILAS_MUESTRA = 50
+# Detecciones guardadas (una por cada origen distinto que se importó)
+MAXIMO_DETECCIONES = 64
+
+FORMATOS = {'inventario': [], 'recetas': []}
+
+_detecciones = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Deteccion:
+    """Dónde está cada dato en los archivos de un origen"""
+    formato: str
+    fila: int                # Fila del encabezado (o de la primera receta) dentro del archivo
+    mapa: Dict[str, int]     # Campo -> posición de la columna
+    columnas: int            # Cantidad de columnas del archivo
+    huella: Tuple            # Lo que identifica al origen en la fila `fila`
+
+
+def registrar_formato(clase):
+    """Decorador: agrega el formato a los que se prueban para su tipo de carga"""
+    FORMATOS[clase.tipo].append(clase())
+    return clase
+
+
+def formato_por_nombre(tipo, nombre):
+    for formato in FORMATOS[tipo]:
+        if formato.nombre == nombre:
+            return formato
+    raise KeyError(f'No hay un formato de {tipo} llamado {nombre}')
+
+
+def vaciar_detecciones():
+    with _lock:
+        _detecciones.clear()
+
+
+# --- Lectura ---
+
+def _es_excel(nombre):
+    return nombre.lower().endswith(('.xls', '.xlsx'))
+
+
+def leer_tabla(archivo, filas=None, columnas=None, como_texto=False):
+    """
+    Lee un CSV, XLS o XLSX sin encabezado (las columnas quedan numeradas desde 0).
+    `archivo` es una ruta o un ArchivoSubido, que se lee directo de su buffer.
+    `filas` limita la lectura a las primeras filas y `columnas` a esas posiciones.
+    """
+    # pandas se importa acá para que el arranque de la app no pague su costo
+    import pandas as pd
+
+    nombre = nombre_archivo(archivo).lower()
+    origen = archivo if isinstance(archivo, str) else archivo.abrir()
+    opciones = {'header': None, 'nrows': filas, 'usecols': columnas}
+    if como_texto:
+        opciones['dtype'] = str
+    if _es_excel(nombre):
+        return pd.read_excel(origen, engine='xlrd' if nombre.endswith('.xls') else None, **opciones)
+    return pd.read_csv(origen, **opciones)
+
+
+def _texto(valor):
+    """Celda de la muestra como texto sin espacios ('' si está vacía)"""
+    if valor is None or valor != valor:  # None o NaN
+        return ''
+    return str(valor).strip()
+
+
+def _filas_muestra(muestra):
+    return [[_texto(v) for v in fila] for fila in muestra.itertuples(index=False, name=None)]
+
+
+# --- Conversiones comunes ---
+
+def _a_float(valor):
+    """Cantidad de un componente (admite coma decimal); None si no es un número"""
+    try:
+        if isinstance(valor, str):
+            return float(valor.replace(',', '.').replace(' ', ''))
+        return float(valor)
+    except (ValueError, TypeError):
+        return None
+
+
+def _columna_texto(serie):
+    """Valores como texto sin espacios, conservando los vacíos (NaN)"""
+    return serie.astype(str).str.strip().where(serie.notna())
+
+
+def _a_canonicas(unidades, por_defecto=None):
+    """
+    (unidad canónica, numerador, denominador) de cada fila, resolviendo el registro de
+    unidades una sola vez por valor distinto. Con `por_defecto` los vacíos usan esa unidad.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codigos, distintas = pd.factorize(unidades, use_na_sentinel=False)
+    resueltas = []
+    for unidad in distintas:
+        if por_defecto is not None and (unidad is None or unidad != unidad or unidad in ('', 'nan')):
+            unidad = por_defecto
+        canonica, conversion = a_canonica(unidad)
+        resueltas.append((canonica, conversion.numerador, conversion.denominador))
+    canonicas = np.array([canonica for canonica, _, _ in resueltas], dtype=object)
+    numeradores = np.array([numerador for _, numerador, _ in resueltas], dtype=float)
+    denominadores = np.array([denominador for _, _, denominador in resueltas], dtype=float)
+    return (pd.Series(canonicas[codigos], index=unidades.index),
+            pd.Series(numeradores[codigos], index=unidades.index),
+            pd.Series(denominadores[codigos], index=unidades.index))
+
+
+# --- Formatos ---
+
+class Formato:
+    """
+    Un formato de archivo de origen. `detectar` recibe la muestra (primeras filas
+    como texto) y devuelve una Deteccion o None; `leer` hace la lectura completa
+    con esa detección y devuelve el resultado que espera la carga.
+    """
+    tipo = None
+    nombre = None
+
+    def detectar(self, muestra):
+        raise NotImplementedError
+
+    def huella(self, fila, mapa):
+        """Lo que tiene que coincidir en la fila detectada para reusar la detección"""
+        return tuple((campo, fila[posicion].lower()) for campo, posicion in sorted(mapa.items()))
+
+    def reconoce(self, muestra, filas, deteccion):
+        """True si la muestra tiene la misma forma que el origen de la detección"""
+        return (
+            muestra.shape[1] == deteccion.columnas
+            and deteccion.fila < len(filas)
+            and self.huella(filas[deteccion.fila], deteccion.mapa) == deteccion.huella
+        )
+
+    def leer(self, archivo, deteccion, registro):
+        raise NotImplementedError
+
+
+@registrar_formato
+class InventarioPorLote(Formato):
+    """
+    Listado de stock por lote del ERP: títulos del reporte, una fila de encabezados
+    (Artículo / Descripción / Lote / Vto. / Estado / Unidad / Cantidad / Total)
+    y debajo un lote por fila, con subtotales sin código.
+    """
+    tipo = 'inventario'
+    nombre = 'stock_por_lote'
+
+    ETIQUETAS = {
+        'codigo': ('artículo', 'articulo', 'código', 'codigo'),
+        'nombre': ('descripción', 'descripcion', 'nombre'),
+        'lote': ('lote',),
+        'vencimiento': ('vto.', 'vto', 'vencimiento'),
+        'estado': ('estado',),
+        'unidad': ('unidad', 'u.m.', 'um'),
+        'cantidad': ('cantidad',),
+    }
+    MINIMO_ETIQUETAS = 4
+    # Posiciones del export original, para encabezados que no se reconocen
+    POSICIONES = {'codigo': 1, 'nombre': 3, 'lote': 4, 'vencimiento': 5, 'estado': 6, 'unidad': 7, 'cantidad': 8}
+
+    def detectar(self, muestra):
+        filas = _filas_muestra(muestra)
+        # La fila de encabezados: la primera con la etiqueta del código exacta o, si no hay,
+        # la primera que menciona "Artículo"
+        numero = next((n for n, fila in enumerate(filas)
+                       if any(celda.lower() in self.ETIQUETAS['codigo'] for celda in fila)), None)
+        if numero is None:
+            numero = next((n for n, fila in enumerate(filas)
+                           if any('artículo' in celda.lower() for celda in fila)), None)
+        if numero is None:
+            return None
+
+        fila = filas[numero]
+        etiquetas = [celda.lower() for celda in fila]
+        mapa = {}
+        for campo, opciones in self.ETIQUETAS.items():
+            posicion = next((i for i, e in enumerate(etiquetas) if e in opciones), None)
+            if posicion is not None:
+                mapa[campo] = posicion
+        # Con pocas etiquetas conocidas no es este listado (p.ej. un libro de recetas)
+        if len(mapa) < self.MINIMO_ETIQUETAS:
+            return None
+        for campo, posicion in self.POSICIONES.items():
+            mapa.setdefault(campo, posicion)
+        if max(mapa.values()) >= len(fila):
+            return None
+        return Deteccion(self.nombre, numero, mapa, muestra.shape[1], self.huella(fila, mapa))
+
+    def leer(self, archivo, deteccion, registro):
+        import pandas as pd
+
+        mapa = deteccion.mapa
+        with registro.etapa('lectura'):
+            df = leer_tabla(archivo, columnas=sorted(set(mapa.values())))
+        registro.filas_leidas = len(df)
+
+        with registro.etapa('limpieza'):
+            df = df.iloc[deteccion.fila + 1:]
+            df = pd.DataFrame({campo: df[posicion] for campo, posicion in mapa.items()})
+
+            # Filas con código de artículo (las demás son subtotales o renglones vacíos)
+            df = df[df['codigo'].notna()].copy()
+            df['codigo'] = df['codigo'].astype(str).str.strip()
+
+            df['vencimiento'] = pd.to_datetime(df['vencimiento'], errors='coerce')
+            # Lotes sin fecha: NaT no se puede guardar en la base, usar None
+            df['vencimiento'] = df['vencimiento'].astype(object).where(df['vencimiento'].notna(), None)
+
+            df['cantidad'] = pd.to_numeric(df['cantidad'], errors='coerce')
+            df = df[df['cantidad'].notna()].copy()
+
+            # Unidad canónica y factor: el registro se consulta una vez por valor distinto
+            unidad, numerador, denominador = _a_canonicas(df['unidad'].astype(str).str.strip())
+            df['unidad_normalizada'] = unidad
+            df['cantidad_normalizada'] = df['cantidad'] * numerador / denominador
+
+            df = df[['codigo', 'nombre', 'lote', 'vencimiento', 'estado', 'unidad', 'cantidad',
+                     'unidad_normalizada', 'cantidad_normalizada']]
+        return df
+
+
+def _armar_recetas(recetas, componentes):
+    """
+    Arma {codigo_receta: {'nombre', 'componentes'}} sin las recetas vacías.
+    `recetas` son (codigo, nombre) en orden de aparición (vale la primera de cada código)
+    y `componentes` son (codigo_receta, codigo, nombre, cantidad, unidad) en orden de archivo.
+    """
+    recetas_dict = {}
+    for codigo, nombre in recetas:
+        if codigo not in recetas_dict:
+            recetas_dict[codigo] = {'nombre': nombre, 'componentes': []}
+    for codigo_receta, codigo, nombre, cantidad, unidad in componentes:
+        recetas_dict[codigo_receta]['componentes'].append({
+            'codigo_producto': codigo,
+            'nombre_producto': nombre,
+            'cantidad': cantidad,
+            'unidad': unidad,
+        })
+    return {k: v for k, v in recetas_dict.items() if v['componentes']}
+
+
+@registrar_formato
+class RecetasPorPasos(Formato):
+    """
+    Libro de recetas del ERP con columnas desplazadas:
+    - Receta: "Artículo" en la columna de marca, código y nombre a su derecha
+      (en el export original: col 1, col 2 y col 5).
+    - Componentes: número de paso en la columna de marca, código, nombre, unidad
+      y cantidad (col 12, 14, 16 y 17).
+    Las demás filas (títulos, vacías) se ignoran.
+    """
+    tipo = 'recetas'
+    nombre = 'recetas_por_pasos'
+
+    MAPA_ORIGINAL = {'marca': 1, 'receta_codigo': 2, 'receta_nombre': 5,
+                     'codigo': 12, 'nombre': 14, 'unidad': 16, 'cantidad': 17}
+
+    def huella(self, fila, mapa):
+        return (mapa['marca'], fila[mapa['marca']].lower())
+
+    def detectar(self, muestra):
+        filas = _filas_muestra(muestra)
+        columnas = muestra.shape[1]
+        marcas = [(n, next((i for i, c in enumerate(fila) if 'artículo' in c.lower()), None))
+                  for n, fila in enumerate(filas)]
+        marcas = [(n, i) for n, i in marcas if i is not None]
+        if not marcas:
+            return None
+        numero, marca = marcas[0]
+        pasos = [fila for fila in filas if marca < len(fila) and fila[marca].isdigit()]
+
+        original = self.MAPA_ORIGINAL
+        if marca == original['marca'] and columnas > max(original.values()) and (
+                not pasos or any(fila[original['codigo']] for fila in pasos)):
+            mapa = dict(original)
+        else:
+            mapa = self._inferir(filas[numero], pasos, marca)
+            if mapa is None:
+                return None
+        return Deteccion(self.nombre, numero, mapa, columnas, self.huella(filas[numero], mapa))
+
+    @staticmethod
+    def _inferir(fila_receta, pasos, marca):
+        """Mapa a partir de qué columnas tienen datos en la fila de receta y en los componentes"""
+        datos_receta = [i for i, c in enumerate(fila_receta) if c and i > marca]
+        # Las columnas con datos más frecuentes en los componentes: código, nombre, unidad, cantidad
+        formas = Counter(tuple(i for i, c in enumerate(fila) if c and i > marca) for fila in pasos)
+        if len(datos_receta) < 1 or not formas:
+            return None
+        forma = formas.most_common(1)[0][0]
+        if len(forma) < 4:
+            return None
+        return {
+            'marca': marca,
+            'receta_codigo': datos_receta[0],
+            'receta_nombre': datos_receta[1] if len(datos_receta) > 1 else datos_receta[0],
+            'codigo': forma[0],
+            'nombre': forma[1],
+            'unidad': forma[-2],
+            'cantidad': forma[-1],
+        }
+
+    def leer(self, archivo, deteccion, registro):
+        mapa = deteccion.mapa
+        with registro.etapa('lectura'):
+            df = leer_tabla(archivo, columnas=sorted(set(mapa.values())))
+        registro.filas_leidas = len(df)
+
+        with registro.etapa('limpieza'):
+            df = df.iloc[deteccion.fila:]
+            marca = _columna_texto(df[mapa['marca']])
+            es_receta = marca.str.lower().str.contains('artículo', regex=False, na=False)
+
+            # Una fila de receta con código inválido no abre receta nueva: sus componentes
+            # siguen yendo a la anterior
+            codigo_receta = _columna_texto(df[mapa['receta_codigo']])
+            valida = es_receta & codigo_receta.notna() & codigo_receta.str.contains(r'\d', na=False) \
+                & (codigo_receta != 'nan')
+            receta_actual = codigo_receta.where(valida).ffill()
+            nombre_receta = _columna_texto(df[mapa['receta_nombre']])
+            nombre_receta = nombre_receta.where(nombre_receta.notna() & (nombre_receta != '') & (nombre_receta != 'nan'),
+                                                codigo_receta)
+
+            codigo = _columna_texto(df[mapa['codigo']])
+            cantidad = df[mapa['cantidad']]
+            es_componente = (
+                ~es_receta & receta_actual.notna()
+                & marca.str.isdigit().fillna(False).astype(bool)
+                & codigo.notna() & (codigo != '') & (codigo != 'nan')
+                & cantidad.notna()
+            )
+            nombre = _columna_texto(df[mapa['nombre']])
+            nombre = nombre.where(nombre.notna() & (nombre != '') & (nombre != 'nan'), codigo)
+            # Las cantidades se guardan en la unidad canónica (1 Kg -> 1000 g)
+            unidad, numerador, denominador = _a_canonicas(_columna_texto(df[mapa['unidad']]), 'uni')
+
+            recetas = zip(codigo_receta[valida], nombre_receta[valida])
+            componentes = [
+                (receta, cod, nom, valor * num / den, uni)
+                for receta, cod, nom, valor, uni, num, den in zip(
+                    receta_actual[es_componente], codigo[es_componente], nombre[es_componente],
+                    map(_a_float, cantidad[es_componente]), unidad[es_componente],
+                    numerador[es_componente], denominador[es_componente],
+                )
+                # Cantidades que no son números se ignoran
+                if valor is not None
+            ]
+            return _armar_recetas(recetas, componentes)
+
+
+@registrar_formato
+class RecetasEnTabla(Formato):
+    """
+    Recetas como tabla plana, un componente por fila, con encabezados
+    codigo_receta, nombre_receta, codigo_producto, nombre_producto, cantidad y unidad
+    (nombre_receta, nombre_producto y unidad son opcionales).
+    """
+    tipo = 'recetas'
+    nombre = 'recetas_en_tabla'
+
+    OBLIGATORIAS = ('codigo_receta', 'codigo_producto', 'cantidad')
+    OPCIONALES = ('nombre_receta', 'nombre_producto', 'unidad')
+
+    def detectar(self, muestra):
+        for numero, fila in enumerate(_filas_muestra(muestra)):
+            etiquetas = [re.sub(r'\s+', '_', celda.lower()) for celda in fila]
+            if all(campo in etiquetas for campo in self.OBLIGATORIAS):
+                mapa = {campo: etiquetas.index(campo)
+                        for campo in self.OBLIGATORIAS + self.OPCIONALES if campo in etiquetas}
+                return Deteccion(self.nombre, numero, mapa, muestra.shape[1], self.huella(fila, mapa))
+        return None
+
+    def leer(self, archivo, deteccion, registro):
+        import pandas as pd
+
+        mapa = deteccion.mapa
+        with registro.etapa('lectura'):
+            df = leer_tabla(archivo, columnas=sorted(set(mapa.values())))
+        registro.filas_leidas = len(df)
+
+        with registro.etapa('limpieza'):
+            df = df.iloc[deteccion.fila + 1:]
+            vacia = pd.Series(float('nan'), index=df.index, dtype=object)
+
+            def columna(campo):
+                return _columna_texto(df[mapa[campo]]) if campo in mapa else vacia
+
+            codigo_receta = columna('codigo_receta')
+            codigo = columna('codigo_producto')
+            cantidad = df[mapa['cantidad']]
+            valida = codigo_receta.notna() & (codigo_receta != '') & codigo.notna() & (codigo != '') \
+                & cantidad.notna()
+            nombre_receta = columna('nombre_receta')
+            nombre_receta = nombre_receta.where(nombre_receta.notna() & (nombre_receta != ''), codigo_receta)
+            nombre = columna('nombre_producto')
+            nombre = nombre.where(nombre.notna() & (nombre != ''), codigo)
+            unidad, numerador, denominador = _a_canonicas(columna('unidad'), 'uni')
+
+            recetas = zip(codigo_receta[valida], nombre_receta[valida])
+            componentes = [
+                (receta, cod, nom, valor * num / den, uni)
+                for receta, cod, nom, valor, uni, num, den in zip(
+                    codigo_receta[valida], codigo[valida], nombre[valida],
+                    map(_a_float, cantidad[valida]), unidad[valida], numerador[valida], denominador[valida],
+                )
+                if valor is not None
+            ]
+            return _armar_recetas(recetas, componentes)
+
+
+# --- Importación ---
+
+def _firma(tipo, archivo, deteccion):
+    extension = os.path.splitext(nombre_archivo(archivo))[1].lower()
+    return (tipo, extension, deteccion.formato, deteccion.columnas, deteccion.fila, deteccion.huella)
+
+
+def _deteccion_guardada(tipo, archivo, muestra, filas):
+    """La detección de un origen ya importado que coincide con la muestra, o None"""
+    extension = os.path.splitext(nombre_archivo(archivo))[1].lower()
+    with _lock:
+        candidatas = [(f, d) for f, d in reversed(_detecciones.items()) if f[:2] == (tipo, extension)]
+    for firma, deteccion in candidatas:
+        if formato_por_nombre(tipo, deteccion.formato).reconoce(muestra, filas, deteccion):
+            with _lock:
+                if firma in _detecciones:
+                    _detecciones.move_to_end(firma)
+            return deteccion
+    return None
+
+
+def detectar_formato(tipo, archivo):
+    """
+    (formato, deteccion, reusada) para el archivo, leyendo solo la muestra.
+    `reusada` es True si la detección salió de un origen ya importado.
+    """
+    muestra = leer_tabla(archivo, filas=FILAS_MUESTRA, como_texto=True)
+    filas = _filas_muestra(muestra)
+
+    deteccion = _deteccion_guardada(tipo, archivo, muestra, filas)
+    if deteccion is not None:
+        return formato_por_nombre(tipo, deteccion.formato), deteccion, True
+
+    for formato in FORMATOS[tipo]:
+        deteccion = formato.detectar(muestra)
+        if deteccion is not None:
+            with _lock:
+                _detecciones[_firma(tipo, archivo, deteccion)] = deteccion
+                while len(_detecciones) > MAXIMO_DETECCIONES:
+                    _detecciones.popitem(last=False)
+            return formato, deteccion, False
+
+    nombres = ', '.join(f.nombre for f in FORMATOS[tipo])
+    raise ValueError(f'No se reconoce el formato del archivo de {tipo} (formatos conocidos: {nombres})')
+
+
+def importar(tipo, archivo, registro):
+    """
+    Detecta el formato del archivo (o reusa la detección de su origen) y lo lee completo.
+    Retorna (resultado, deteccion); el resultado es el DataFrame de lotes para
+    'inventario' y el dict de recetas para 'recetas'.
+    """
+    with registro.etapa('lectura'):
+        formato, deteccion, _ = detectar_formato(tipo, archivo)
+    registro.lector = f'{registro.lector} ({formato.nombre})'
+    return formato.leer(archivo, deteccion, registro), deteccion
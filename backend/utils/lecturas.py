@@ -0,0 +1,150 @@
+"""
+Consultas de solo lectura para las páginas y los cálculos.
+
+Seleccionan solo las columnas que se muestran y devuelven filas (Row) o
+dataclasses con __slots__, sin pasar por el identity map ni el seguimiento
+de cambios de la sesión. Las escrituras siguen usando los modelos del ORM.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db, Producto, Receta, RecetaComponente
+from utils.alertas import expresion_estado_vencimiento
+from utils.depositos import en_todos, deposito_actual
+
+# SQLite limita la cantidad de parámetros por sentencia: los IN grandes se parten
+TAMANO_BLOQUE_IN = 900
+
+
+@dataclass(frozen=True)
+class ComponenteLectura:
+    __slots__ = ('nombre_producto', 'cantidad_necesaria', 'unidad')
+    nombre_producto: Optional[str]
+    cantidad_necesaria: float
+    unidad: str
+
+
+@dataclass(frozen=True)
+class RecetaLectura:
+    __slots__ = ('id', 'codigo', 'nombre', 'componentes')
+    id: int
+    codigo: str
+    nombre: str
+    componentes: List[ComponenteLectura]
+
+
+def en_bloques(valores):
+    valores = list(valores)
+    for inicio in range(0, len(valores), TAMANO_BLOQUE_IN):
+        yield valores[inicio:inicio + TAMANO_BLOQUE_IN]
+
+
+def orden_vencimiento(fila):
+    """Clave para ordenar lotes como ORDER BY fecha_vencimiento de SQLite (sin fecha primero)"""
+    return (fila.fecha_vencimiento is not None, fila.fecha_vencimiento)
+
+
+def lotes_stock(ahora):
+    """
+    Lotes de stock de todos los depósitos, uno después del otro, con su depósito
+    y su estado de vencimiento (vencido / proximo / vigente / sin_fecha)
+    """
+    def leer():
+        return db.session.execute(
+            db.select(
+                Producto.codigo, Producto.nombre, Producto.lote, Producto.cantidad_disponible,
+                Producto.unidad, Producto.fecha_vencimiento,
+                expresion_estado_vencimiento(ahora).label('estado_vencimiento'),
+                db.literal(deposito_actual()).label('deposito')
+            ).where(Producto.is_master == False)
+        ).all()
+
+    return [fila for _, filas in en_todos(leer) for fila in filas]
+
+
+def recetas_con_componentes(receta_ids=None):
+    """
+    Recetas con sus componentes en una sola consulta, ordenadas por id.
+    Con `receta_ids` solo se leen esas recetas.
+    """
+    consulta = db.select(
+        Receta.id, Receta.codigo, Receta.nombre,
+        RecetaComponente.id.label('componente_id'), Producto.nombre.label('nombre_producto'),
+        RecetaComponente.cantidad_necesaria, RecetaComponente.unidad
+    ).outerjoin(RecetaComponente, RecetaComponente.receta_id == Receta.id
+    ).outerjoin(Producto, Producto.id == RecetaComponente.producto_id
+    ).order_by(Receta.id, RecetaComponente.id)
+
+    bloques = [None] if receta_ids is None else list(en_bloques(receta_ids))
+    recetas = {}
+    for bloque in bloques:
+        filas = db.session.execute(consulta if bloque is None else consulta.where(Receta.id.in_(bloque)))
+        for fila in filas:
+            receta = recetas.get(fila.id)
+            if receta is None:
+                receta = recetas[fila.id] = RecetaLectura(fila.id, fila.codigo, fila.nombre, [])
+            if fila.componente_id is not None:
+                receta.componentes.append(
+                    ComponenteLectura(fila.nombre_producto, fila.cantidad_necesaria, fila.unidad)
+                )
+    return [recetas[receta_id] for receta_id in sorted(recetas)]
+
+
+def componentes_de_recetas(receta_ids):
+    """{receta_id: [(producto_id, cantidad_necesaria, unidad), ...]} en el orden de carga de los componentes"""
+    componentes = {}
+    for bloque in en_bloques(receta_ids):
+        filas = db.session.execute(
+            db.select(RecetaComponente.receta_id, RecetaComponente.producto_id,
+                      RecetaComponente.cantidad_necesaria, RecetaComponente.unidad)
+            .where(RecetaComponente.receta_id.in_(bloque))
+            .order_by(RecetaComponente.id)
+        )
+        for receta_id, producto_id, cantidad, unidad in filas:
+            componentes.setdefault(receta_id, []).append((producto_id, cantidad, unidad))
+    return componentes
+
+
+def productos_por_id(producto_ids):
+    """{producto_id: fila con codigo, nombre y unidad}"""
+    productos = {}
+    for bloque in en_bloques(producto_ids):
+        for fila in db.session.execute(
+            db.select(Producto.id, Producto.codigo, Producto.nombre, Producto.unidad).where(Producto.id.in_(bloque))
+        ):
+            productos[fila.id] = fila
+    return productos
+
+
+def lotes_por_codigo(codigos):
+    """
+    {codigo: [filas de lote]} con los lotes de stock de cada código en todos los depósitos,
+    del que vence primero al último (a igual vencimiento, en el orden de los depósitos)
+    """
+    codigos = list(codigos)
+
+    def leer():
+        lotes = {}
+        for bloque in en_bloques(codigos):
+            filas = db.session.execute(
+                db.select(Producto.codigo, Producto.lote, Producto.cantidad_disponible, Producto.unidad,
+                          Producto.fecha_vencimiento, db.literal(deposito_actual()).label('deposito'))
+                .where(Producto.is_master == False, Producto.codigo.in_(bloque))
+                .order_by(Producto.codigo, Producto.fecha_vencimiento.asc(), Producto.id)
+            )
+            for fila in filas:
+                lotes.setdefault(fila.codigo, []).append(fila)
+        return lotes
+
+    partes = [lotes for _, lotes in en_todos(leer)]
+    if len(partes) == 1:
+        return partes[0]
+    unidos = {}
+    for lotes in partes:
+        for codigo, filas in lotes.items():
+            unidos.setdefault(codigo, []).extend(filas)
+    for codigo, filas in unidos.items():
+        filas.sort(key=orden_vencimiento)  # Estable: respeta el orden de cada depósito
+    return unidos
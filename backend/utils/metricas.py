@@ -0,0 +1,238 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from flask import has_request_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites superiores de los buckets de cada histograma
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_SENTENCIAS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+BUCKETS_FILAS = (10, 100, 1000, 10000, 100000, 1000000)
+
+# Estado del pedido en curso (por thread): solo existe mientras se atiende un pedido
+_local = threading.local()
+# Protege la suma de lo medido en otros threads al pedido que los lanzó
+_lock_pedidos = threading.Lock()
+
+
+class Histograma:
+    """Histograma acumulativo por etiquetas, en el formato que espera Prometheus."""
+
+    def __init__(self, nombre, descripcion, buckets):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.buckets = buckets
+        self._series = {}  # etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, etiquetas, valor):
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        lineas = [f'# HELP {self.nombre} {self.descripcion}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            for etiquetas, (conteos, suma, total) in sorted(self._series.items()):
+                base = ','.join(f'{k}="{v}"' for k, v in etiquetas)
+                for limite, conteo in zip(self.buckets, conteos):
+                    lineas.append(f'{self.nombre}_bucket{{{base},le="{limite}"}} {conteo}')
+                lineas.append(f'{self.nombre}_bucket{{{base},le="+Inf"}} {total}')
+                lineas.append(f'{self.nombre}_sum{{{base}}} {suma}')
+                lineas.append(f'{self.nombre}_count{{{base}}} {total}')
+        return lineas
+
+
+HISTOGRAMAS = {
+    'duracion': Histograma('applab_request_duration_seconds',
+                           'Tiempo total de cada pedido', BUCKETS_SEGUNDOS),
+    'sql_tiempo': Histograma('applab_request_sql_seconds',
+                             'Tiempo total en SQL por pedido', BUCKETS_SEGUNDOS),
+    'sql_sentencias': Histograma('applab_request_sql_statements',
+                                 'Sentencias SQL ejecutadas por pedido', BUCKETS_SENTENCIAS),
+    'sql_filas': Histograma('applab_request_sql_rows',
+                            'Filas devueltas o modificadas por SQL por pedido', BUCKETS_FILAS),
+}
+
+
+class _CursorMedido(sqlite3.Cursor):
+    """
+    Cursor que suma las filas leídas al pedido en curso y avisa (una vez) cuando
+    se terminaron de leer sus filas o se cerró: sqlite3 solo ejecuta el primer
+    paso de un SELECT en execute(), el resto del trabajo ocurre al leer.
+    """
+    al_terminar = None  # Función sin argumentos a llamar al agotar las filas o cerrar
+
+    def _sumar(self, filas):
+        pedido = getattr(_local, 'pedido', None)
+        if pedido is not None:
+            pedido['filas'] += filas
+
+    def _terminar(self):
+        funcion = self.al_terminar
+        if funcion is not None:
+            self.al_terminar = None
+            funcion()
+
+    def fetchone(self):
+        fila = super().fetchone()
+        if fila is not None:
+            self._sumar(1)
+        else:
+            self._terminar()
+        return fila
+
+    def fetchmany(self, size=None):
+        pedidas = self.arraysize if size is None else size
+        filas = super().fetchmany(pedidas)
+        self._sumar(len(filas))
+        if len(filas) < pedidas:
+            self._terminar()
+        return filas
+
+    def fetchall(self):
+        filas = super().fetchall()
+        self._sumar(len(filas))
+        self._terminar()
+        return filas
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+
+class _ConexionMedida(sqlite3.Connection):
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+
+def pedido_en_curso():
+    """Acumulador del pedido que atiende este thread, o None"""
+    return getattr(_local, 'pedido', None)
+
+
+def ruta_en_curso():
+    """'MÉTODO /ruta' del pedido que atiende (o continúa) este thread, o None"""
+    if has_request_context():
+        return f'{request.method} {request.path}'
+    return getattr(_local, 'ruta', None)
+
+
+@contextmanager
+def continuar_medicion(pedido, ruta):
+    """
+    Para trabajo de un pedido hecho en otro thread (p.ej. el pool de depósitos):
+    lo que se ejecute en el bloque se mide aparte y al salir se suma a `pedido`,
+    y las sentencias se atribuyen a `ruta`.
+    """
+    propio = None
+    if pedido is not None:
+        propio = {'inicio': time.perf_counter(), 'sql_inicio': None, 'sql_tiempo': 0.0,
+                  'sql_sentencias': 0, 'filas': 0}
+    anterior = (getattr(_local, 'pedido', None), getattr(_local, 'ruta', None))
+    _local.pedido, _local.ruta = propio, ruta
+    try:
+        yield
+    finally:
+        _local.pedido, _local.ruta = anterior
+        if propio is not None:
+            with _lock_pedidos:
+                for clave in ('sql_tiempo', 'sql_sentencias', 'filas'):
+                    pedido[clave] += propio[clave]
+
+
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    pedido = getattr(_local, 'pedido', None)
+    if pedido is not None:
+        pedido['sql_inicio'] = time.perf_counter()
+
+
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    pedido = getattr(_local, 'pedido', None)
+    if pedido is None or pedido['sql_inicio'] is None:
+        return
+    pedido['sql_tiempo'] += time.perf_counter() - pedido['sql_inicio']
+    pedido['sql_inicio'] = None
+    pedido['sql_sentencias'] += 1
+    # Para INSERT/UPDATE/DELETE rowcount son las filas modificadas (en SELECT sqlite da -1)
+    if cursor.rowcount > 0:
+        pedido['filas'] += cursor.rowcount
+
+
+def exportar_metricas():
+    """Texto de todas las métricas en formato de exposición de Prometheus."""
+    lineas = []
+    for histograma in HISTOGRAMAS.values():
+        lineas.extend(histograma.exportar())
+    return '\n'.join(lineas) + '\n'
+
+
+def usar_conexiones_medidas(app):
+    """
+    Conexiones sqlite con cursor que cuenta filas leídas y avisa al terminar de leer.
+    Debe llamarse antes de db.init_app (los depósitos copian estas opciones).
+    """
+    if app.config.get('SQLALCHEMY_DATABASE_URI', '').startswith('sqlite'):
+        opciones = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        opciones.setdefault('connect_args', {})['factory'] = _ConexionMedida
+
+
+def registrar_metricas(app):
+    """
+    Mide cada pedido (tiempo total, sentencias SQL, tiempo en SQL y filas)
+    y expone los histogramas en /metrics. Debe llamarse antes de db.init_app.
+    Con METRICAS desactivado no se registra ningún hook, así que no hay costo.
+    """
+    if not app.config.get('METRICAS'):
+        return
+
+    usar_conexiones_medidas(app)
+    event.listen(Engine, 'before_cursor_execute', _antes_de_sentencia)
+    event.listen(Engine, 'after_cursor_execute', _despues_de_sentencia)
+
+    @app.before_request
+    def _iniciar_medicion():
+        _local.pedido = {
+            'inicio': time.perf_counter(),
+            'sql_inicio': None,
+            'sql_tiempo': 0.0,
+            'sql_sentencias': 0,
+            'filas': 0,
+        }
+
+    @app.after_request
+    def _registrar_medicion(respuesta):
+        pedido = getattr(_local, 'pedido', None)
+        if pedido is None:
+            return respuesta
+
+        duracion = time.perf_counter() - pedido['inicio']
+        etiquetas = (('endpoint', request.endpoint or 'desconocido'), ('method', request.method))
+        HISTOGRAMAS['duracion'].observar(etiquetas, duracion)
+        HISTOGRAMAS['sql_tiempo'].observar(etiquetas, pedido['sql_tiempo'])
+        HISTOGRAMAS['sql_sentencias'].observar(etiquetas, pedido['sql_sentencias'])
+        HISTOGRAMAS['sql_filas'].observar(etiquetas, pedido['filas'])
+
+        if app.config.get('METRICAS_SERVER_TIMING'):
+            respuesta.headers['Server-Timing'] = (
+                f'app;dur={duracion * 1000:.1f}, '
+                f'sql;dur={pedido["sql_tiempo"] * 1000:.1f};desc="{pedido["sql_sentencias"]} sentencias, {pedido["filas"]} filas"'
+            )
+        return respuesta
+
+    @app.teardown_request
+    def _terminar_medicion(exc):
+        _local.pedido = None
+
+    @app.route('/metrics')
+    def metrics():
+        """Métricas por endpoint en formato Prometheus"""
+        return Response(exportar_metricas(), mimetype='text/plain; version=0.0.4')
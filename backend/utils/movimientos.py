@@ -0,0 +1,181 @@
+from datetime import datetime
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db, Producto, MovimientoStock, PuntoControlStock, PuntoControlLote
+
+# Cada cuántos movimientos se guarda un punto de control del stock
+MOVIMIENTOS_POR_PUNTO_CONTROL = 5000
+# Saldos menores a esto se consideran cero (errores de redondeo al sumar variaciones)
+EPSILON = 1e-9
+
+
+def registrar_movimientos(movimientos, origen, referencia=None):
+    """
+    Agrega movimientos al libro en un solo INSERT (executemany), dentro de la transacción
+    actual: quedan guardados con el commit de quien los registra.
+    `movimientos` son dicts con codigo, lote, unidad y cantidad (la variación).
+    """
+    if not movimientos:
+        return
+    fecha = datetime.now()
+    for movimiento in movimientos:
+        movimiento['fecha'] = fecha
+        movimiento['origen'] = origen
+        movimiento['referencia'] = referencia
+    db.session.execute(db.insert(MovimientoStock), movimientos)
+
+
+def _saldos_stock_actual(signo):
+    """SELECT con el stock actual por lote (multiplicado por signo), con las columnas del libro"""
+    return db.select(
+        db.literal(datetime.now()),
+        Producto.codigo,
+        Producto.lote,
+        Producto.unidad,
+        Producto.cantidad_disponible * signo,
+    ).where(Producto.is_master == False, Producto.cantidad_disponible != 0)
+
+
+def _columnas_libro():
+    return [MovimientoStock.fecha, MovimientoStock.codigo, MovimientoStock.lote,
+            MovimientoStock.unidad, MovimientoStock.cantidad]
+
+
+def registrar_vaciado_stock(origen='vaciar_stock'):
+    """Registra la salida de todo el stock actual, antes de borrar los productos de stock"""
+    db.session.execute(
+        db.insert(MovimientoStock)
+        .from_select(_columnas_libro() + [MovimientoStock.origen],
+                     _saldos_stock_actual(-1).add_columns(db.literal(origen)))
+    )
+
+
+def inicializar_libro_stock():
+    """
+    En una base que ya tenía stock antes de existir el libro, registra el stock actual
+    como saldo inicial para que las variaciones siguientes sumen bien.
+    """
+    if db.session.query(MovimientoStock.id).first() is not None:
+        return False
+    if db.session.query(Producto.id).filter_by(is_master=False).first() is None:
+        return False
+    db.session.execute(
+        db.insert(MovimientoStock)
+        .from_select(_columnas_libro() + [MovimientoStock.origen],
+                     _saldos_stock_actual(1).add_columns(db.literal('saldo_inicial')))
+    )
+    db.session.commit()
+    return True
+
+
+def _ultimo_punto_control(hasta_fecha=None):
+    consulta = db.select(PuntoControlStock).order_by(PuntoControlStock.hasta_movimiento_id.desc())
+    if hasta_fecha is not None:
+        consulta = consulta.where(PuntoControlStock.fecha <= hasta_fecha)
+    return db.session.execute(consulta.limit(1)).scalar()
+
+
+def _saldos(punto, hasta_movimiento_id=None, hasta_fecha=None, codigo=None):
+    """
+    SELECT de saldos por código y lote: el punto de control (si hay) más los
+    movimientos posteriores a él, hasta un movimiento o una fecha.
+    """
+    movimientos = db.select(
+        MovimientoStock.codigo, MovimientoStock.lote, MovimientoStock.unidad, MovimientoStock.cantidad
+    )
+    if punto is not None:
+        movimientos = movimientos.where(MovimientoStock.id > punto.hasta_movimiento_id)
+    if hasta_movimiento_id is not None:
+        movimientos = movimientos.where(MovimientoStock.id <= hasta_movimiento_id)
+    if hasta_fecha is not None:
+        movimientos = movimientos.where(MovimientoStock.fecha <= hasta_fecha)
+    if codigo is not None:
+        movimientos = movimientos.where(MovimientoStock.codigo == codigo)
+
+    partes = [movimientos]
+    if punto is not None:
+        base = db.select(
+            PuntoControlLote.codigo, PuntoControlLote.lote, PuntoControlLote.unidad, PuntoControlLote.cantidad
+        ).where(PuntoControlLote.punto_id == punto.id)
+        if codigo is not None:
+            base = base.where(PuntoControlLote.codigo == codigo)
+        partes.insert(0, base)
+
+    todos = db.union_all(*partes).subquery() if len(partes) > 1 else movimientos.subquery()
+    saldo = db.func.sum(todos.c.cantidad)
+    return db.select(
+        todos.c.codigo, todos.c.lote, db.func.max(todos.c.unidad).label('unidad'), saldo.label('cantidad')
+    ).group_by(todos.c.codigo, todos.c.lote).having(db.func.abs(saldo) > EPSILON)
+
+
+def crear_punto_control():
+    """Guarda un punto de control con el saldo de cada lote hasta el último movimiento"""
+    ultimo = db.session.execute(
+        db.select(MovimientoStock.id, MovimientoStock.fecha).order_by(MovimientoStock.id.desc()).limit(1)
+    ).first()
+    if ultimo is None:
+        return None
+    anterior = _ultimo_punto_control()
+    if anterior is not None and anterior.hasta_movimiento_id >= ultimo.id:
+        return anterior
+
+    punto = PuntoControlStock(fecha=ultimo.fecha, hasta_movimiento_id=ultimo.id)
+    db.session.add(punto)
+    db.session.flush()
+
+    # Se parte del punto anterior: solo se suman los movimientos nuevos
+    saldos = _saldos(anterior, hasta_movimiento_id=ultimo.id).subquery()
+    db.session.execute(
+        db.insert(PuntoControlLote).from_select(
+            ['punto_id', 'codigo', 'lote', 'unidad', 'cantidad'],
+            db.select(db.literal(punto.id), saldos.c.codigo, saldos.c.lote, saldos.c.unidad, saldos.c.cantidad)
+        )
+    )
+    db.session.commit()
+    return punto
+
+
+def crear_punto_control_si_corresponde():
+    """Crea un punto de control si hay suficientes movimientos desde el último"""
+    anterior = _ultimo_punto_control()
+    consulta = db.select(db.func.count(MovimientoStock.id))
+    if anterior is not None:
+        consulta = consulta.where(MovimientoStock.id > anterior.hasta_movimiento_id)
+    if db.session.execute(consulta).scalar() >= MOVIMIENTOS_POR_PUNTO_CONTROL:
+        return crear_punto_control()
+    return None
+
+
+def stock_a_fecha(fecha, codigo=None):
+    """
+    Stock por código y lote tal como estaba en `fecha`.
+    Parte del punto de control más cercano anterior a la fecha y suma solo los movimientos siguientes.
+    """
+    punto = _ultimo_punto_control(hasta_fecha=fecha)
+    filas = db.session.execute(
+        _saldos(punto, hasta_fecha=fecha, codigo=codigo).order_by('codigo', 'lote')
+    ).all()
+    return [
+        {'codigo': f.codigo, 'lote': f.lote, 'unidad': f.unidad, 'cantidad': round(f.cantidad, 6)}
+        for f in filas
+    ]
+
+
+def movimientos_de(codigo, lote=None, limite=200):
+    """Últimos movimientos de un código (y lote), del más reciente al más antiguo"""
+    consulta = db.select(MovimientoStock).filter_by(codigo=codigo)
+    if lote is not None:
+        consulta = consulta.filter_by(lote=lote)
+    consulta = consulta.order_by(MovimientoStock.id.desc()).limit(limite)
+    return [
+        {
+            'fecha': m.fecha.isoformat(timespec='seconds'),
+            'lote': m.lote,
+            'unidad': m.unidad,
+            'cantidad': m.cantidad,
+            'origen': m.origen,
+            'referencia': m.referencia,
+        }
+        for m in db.session.execute(consulta).scalars()
+    ]
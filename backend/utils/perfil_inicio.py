@@ -0,0 +1,88 @@
+"""
+Perfil del arranque: mide cuánto tarda cada import y cuánto pasa hasta
+atender el primer pedido. Solo usa la biblioteca estándar para poder
+activarse antes de importar Flask, SQLAlchemy, etc.
+"""
+import builtins
+import sys
+import threading
+import time
+
+INICIO = time.perf_counter()
+
+_import_original = builtins.__import__
+_tiempos = []  # (modulo, segundos, profundidad)
+_profundidad = 0
+_primer_pedido = {}
+
+
+def _import_medido(name, globals=None, locals=None, fromlist=(), level=0):
+    global _profundidad
+    if level != 0 or name in sys.modules:
+        return _import_original(name, globals, locals, fromlist, level)
+
+    _profundidad += 1
+    inicio = time.perf_counter()
+    try:
+        return _import_original(name, globals, locals, fromlist, level)
+    finally:
+        _profundidad -= 1
+        _tiempos.append((name, time.perf_counter() - inicio, _profundidad))
+
+
+def activar():
+    """Empieza a medir los imports (tiempos acumulados, incluyen sub-imports)."""
+    builtins.__import__ = _import_medido
+
+
+def desactivar():
+    builtins.__import__ = _import_original
+
+
+def registrar_primer_pedido(app):
+    """Guarda el momento en que se empieza y se termina de atender el primer pedido."""
+    @app.before_request
+    def _marcar_inicio_pedido():
+        _primer_pedido.setdefault('inicio', time.perf_counter())
+
+    @app.after_request
+    def _marcar_fin_pedido(respuesta):
+        _primer_pedido.setdefault('fin', time.perf_counter())
+        return respuesta
+
+
+def reporte(marcas, top=15):
+    """Arma el texto del reporte: imports más lentos y marcas de tiempo del arranque."""
+    lineas = ['=' * 60, 'Perfil de inicio de AppLab', '=' * 60]
+    lineas.append(f'{"Módulo":<40}{"ms":>10}')
+    directos = [t for t in _tiempos if t[2] <= 1]
+    for modulo, segundos, profundidad in sorted(directos, key=lambda t: t[1], reverse=True)[:top]:
+        nombre = ('  ' * profundidad) + modulo
+        lineas.append(f'{nombre:<40}{segundos * 1000:>10.1f}')
+    lineas.append('-' * 60)
+    for descripcion, momento in marcas:
+        lineas.append(f'{descripcion:<40}{(momento - INICIO) * 1000:>10.1f}')
+    if 'fin' in _primer_pedido:
+        lineas.append(f'{"Primer pedido atendido":<40}{(_primer_pedido["fin"] - INICIO) * 1000:>10.1f}')
+    lineas.append('=' * 60)
+    return '\n'.join(lineas)
+
+
+def medir_primer_pedido(host, puerto, marcas, esperar_servidor):
+    """
+    En un thread: espera a que el servidor esté listo, hace un pedido a /
+    e imprime el reporte completo.
+    """
+    def medir():
+        import urllib.request
+
+        if esperar_servidor(host, puerto):
+            marcas.append(('Servidor aceptando conexiones', time.perf_counter()))
+            try:
+                urllib.request.urlopen(f'http://{host}:{puerto}/', timeout=30).read()
+            except OSError:
+                pass
+        desactivar()
+        print(reporte(marcas))
+
+    threading.Thread(target=medir, daemon=True).start()
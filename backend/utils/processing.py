@@ -1,168 +1,204 @@
-import pandas as pd
 from datetime import datetime
+import string
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from models import db, Producto, Receta, RecetaComponente
+from flask import current_app
+from models import db, Producto, Receta, RecetaComponente, MovimientoStock, PuntoControlLote
+from utils.cache import marcar_recetas_modificadas, invalidar_recetas, incrementar_version_datos
+from utils.alertas import refrescar_resumen_vencimientos
+from utils.importaciones import RegistroImportacion, nombre_archivo
+from utils.movimientos import registrar_movimientos, crear_punto_control_si_corresponde
+from utils.importadores import importar
+# normalizar_unidad y convertir_cantidad se siguen exportando desde este módulo
+from utils.unidades import normalizar_unidad, convertir_cantidad, unidades_conocidas, a_canonica
+from utils.lecturas import en_bloques
+from utils.depositos import en_deposito, DEPOSITO_PRINCIPAL
 
-def limpiar_inventario_csv(file_path):
+# Filas por sentencia al escribir los cambios de una carga de recetas
+TAMANO_LOTE_ESCRITURA = 1000
+# lower() e ilike de SQLite solo pasan a minúsculas las letras ASCII: se compara igual acá
+_MINUSCULAS_ASCII = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+# Unidad con que guardaba cada alias el importador anterior a utils/unidades.py
+_UNIDAD_ANTERIOR = {
+    'kg': 'g', 'kilo': 'g', 'kilogramo': 'g', 'g': 'g', 'gr': 'g', 'gramo': 'g', 'gramos': 'g',
+    'l': 'L', 'litro': 'L', 'litros': 'L', 'ml': 'L', 'mililitro': 'L', 'mililitros': 'L',
+    'uni': 'uni', 'unidad': 'uni', 'unidades': 'uni', 'u': 'uni',
+}
+
+
+def _como_importador_anterior(cantidad, unidad):
     """
-    Lee un archivo CSV o XLS de inventario y limpia las filas que no son productos.
-    Retorna un DataFrame limpio con solo los productos.
+    (unidad, cantidad) que guardaba el importador anterior a utils/unidades.py: solo
+    convertía la cantidad de kg/kilo y ml/mililitro, aunque cambiaba la unidad de otros
+    alias (p.ej. 2 'kilogramo' quedaba como 2 'g').
     """
-    # Leer el archivo según su extensión
-    if file_path.lower().endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(file_path, engine='xlrd' if file_path.lower().endswith('.xls') else None)
-    else:
-        df = pd.read_csv(file_path)
-    
-    # Identificar las filas que contienen productos
-    # Los productos tienen un código de artículo en la segunda columna
-    # y suelen tener datos en las columnas de Lote, Vto., etc.
-    
-    # Encontrar la fila donde empieza la tabla de productos (contiene "Artículo")
-    start_idx = None
-    for idx, row in df.iterrows():
-        if 'Artículo' in str(row.values):
-            start_idx = idx + 1
-            break
-    
-    if start_idx is None:
-        raise ValueError("No se encontró el inicio de la tabla de productos en el CSV")
-    
-    # Filtrar solo las filas desde donde empiezan los productos
-    df_productos = df.iloc[start_idx:].copy()
-    
-    # Renombrar columnas para facilitar el trabajo
-    # Basándonos en la estructura: Artículo, nombre, Lote, Vto., Estado, Unidad, Cantidad, Total
-    num_cols = len(df_productos.columns)
-    if num_cols >= 10:
-        df_productos.columns = ['col0', 'codigo', 'col2', 'nombre', 'lote', 'vencimiento', 
-                               'estado', 'unidad', 'cantidad', 'total'] + [f'col{i}' for i in range(10, num_cols)]
-    else:
-        # Si hay menos columnas, ajustar
-        default_cols = ['col0', 'codigo', 'col2', 'nombre', 'lote', 'vencimiento', 
-                       'estado', 'unidad', 'cantidad', 'total']
-        df_productos.columns = default_cols[:num_cols]
-    
-    # Filtrar filas que tienen código de artículo (no vacías)
-    df_productos = df_productos[df_productos['codigo'].notna()].copy()
-    
-    # Limpiar espacios en blanco en código
-    df_productos['codigo'] = df_productos['codigo'].astype(str).str.strip()
-    
-    # Convertir fecha de vencimiento a datetime
-    df_productos['vencimiento'] = pd.to_datetime(df_productos['vencimiento'], errors='coerce')
-    
-    # Convertir cantidad a float
-    df_productos['cantidad'] = pd.to_numeric(df_productos['cantidad'], errors='coerce')
-    
-    # Eliminar filas sin cantidad válida
-    df_productos = df_productos[df_productos['cantidad'].notna()].copy()
-    
-    # Normalizar unidades de medida
-    df_productos['unidad'] = df_productos['unidad'].astype(str).str.strip()
-    df_productos['unidad_normalizada'] = df_productos['unidad'].apply(normalizar_unidad)
-    df_productos['cantidad_normalizada'] = df_productos.apply(
-        lambda row: convertir_cantidad(row['cantidad'], row['unidad'], row['unidad_normalizada']), 
-        axis=1
-    )
-    
-    return df_productos[['codigo', 'nombre', 'lote', 'vencimiento', 'estado', 
-                        'unidad_normalizada', 'cantidad_normalizada']]
+    clave = str(unidad).strip().lower()
+    if clave in ('kg', 'kilo'):
+        cantidad = cantidad * 1000
+    elif clave in ('ml', 'mililitro'):
+        cantidad = cantidad / 1000
+    return _UNIDAD_ANTERIOR.get(clave, clave), cantidad
 
 
-def normalizar_unidad(unidad):
+def convertir_unidades_guardadas():
     """
-    Normaliza las unidades de medida a un formato estándar.
-    Convierte todo a gramos (g) o litros (L).
+    Conversión única al iniciar: pasa a la unidad canónica las filas que el importador
+    anterior guardó con un alias sin convertir (p.ej. 2 'kilos' -> 2000 'g'), en el stock,
+    los componentes de recetas, el libro de movimientos y los puntos de control.
+    Las filas ya convertidas no se vuelven a tocar. Retorna cuántas filas convirtió.
+
+    Las filas que ese importador guardó con la unidad canónica pero sin convertir la
+    cantidad (2 'kilogramo' como 2 'g', todos los componentes de recetas en Kg o ml) no se
+    distinguen de las correctas: hay que volver a cargar esos archivos. Al recargar el
+    stock, la diferencia de esos lotes va al libro con origen 'conversion_unidades'.
     """
-    unidad = str(unidad).strip().lower()
-    
-    # Mapeo de unidades
-    if unidad in ['kg', 'kilo', 'kilogramo']:
-        return 'g'
-    elif unidad in ['l', 'litro', 'litros']:
-        return 'L'
-    elif unidad in ['g', 'gr', 'gramo', 'gramos']:
-        return 'g'
-    elif unidad in ['ml', 'mililitro', 'mililitros']:
-        return 'L'
-    elif unidad in ['uni', 'unidad', 'unidades', 'u']:
-        return 'uni'
-    else:
-        return unidad
-
-
-def convertir_cantidad(cantidad, unidad_original, unidad_destino):
+    alias = {}
+    for unidad in unidades_conocidas():
+        canonica, conversion = a_canonica(unidad)
+        if canonica != unidad:
+            alias[unidad] = (canonica, conversion)
+
+    convertidas = 0
+    for modelo, cantidad in (
+        (Producto, Producto.cantidad_disponible),
+        (RecetaComponente, RecetaComponente.cantidad_necesaria),
+        (MovimientoStock, MovimientoStock.cantidad),
+        (PuntoControlLote, PuntoControlLote.cantidad),
+    ):
+        # Un solo UPDATE por tabla; los CASE leen la unidad de antes de la actualización
+        numerador = db.case({u: c.numerador for u, (_, c) in alias.items()}, value=modelo.unidad)
+        denominador = db.case({u: c.denominador for u, (_, c) in alias.items()}, value=modelo.unidad)
+        canonica = db.case({u: canonica for u, (canonica, _) in alias.items()}, value=modelo.unidad)
+        convertidas += db.session.execute(
+            db.update(modelo)
+            .where(modelo.unidad.in_(list(alias)))
+            .values({cantidad: cantidad * numerador / denominador, modelo.unidad: canonica})
+        ).rowcount
+    db.session.commit()
+
+    if convertidas:
+        invalidar_recetas()
+        incrementar_version_datos()
+    return convertidas
+
+
+def limpiar_inventario_csv(file_path, registro=None):
     """
-    Convierte la cantidad de una unidad a otra.
+    Lee un archivo CSV o XLS de inventario y limpia las filas que no son productos.
+    Retorna un DataFrame limpio con solo los productos.
+    El formato del archivo lo detecta el registro de importadores (utils/importadores.py).
     """
-    unidad_original = str(unidad_original).strip().lower()
-    
-    # Si la unidad original es Kg y la destino es g, multiplicar por 1000
-    if unidad_original in ['kg', 'kilo'] and unidad_destino == 'g':
-        return cantidad * 1000
-    
-    # Si la unidad original es mL y la destino es L, dividir por 1000
-    if unidad_original in ['ml', 'mililitro'] and unidad_destino == 'L':
-        return cantidad / 1000
-    
-    # Si no hay conversión necesaria, retornar la cantidad original
-    return cantidad
+    registro = registro or RegistroImportacion('inventario', file_path)
+    df_productos, _ = importar('inventario', file_path, registro)
+    registro.filas_validas = len(df_productos)
+    return df_productos
 
 
 def cargar_inventario_a_db(file_path):
     """
     Procesa un archivo de inventario y carga los productos en la base de datos.
+    Cada carga queda registrada en el historial de importaciones con el tiempo de cada etapa.
+
+    En un depósito que no es el principal hay tres commits, en este orden: los lotes y
+    movimientos en el archivo del depósito, los nombres de maestros y por último la
+    Importacion (los dos en la base principal). Una Importacion exitosa implica que el
+    stock ya está confirmado. Si falla algo después del commit del depósito, el stock
+    queda cargado y el error se registra en el log de la app con el archivo y su hash.
     """
-    # Limpiar y procesar el archivo
-    df_productos = limpiar_inventario_csv(file_path)
-    
-    productos_cargados = 0
-    productos_actualizados = 0
-    
-    for _, row in df_productos.iterrows():
-        # Buscar si el producto ya existe por código y lote
-        producto_existente = Producto.query.filter_by(
-            codigo=row['codigo'], 
-            lote=row['lote'],
-            is_master=False  # Solo buscar en productos de stock
-        ).first()
+    import pandas as pd
+
+    with RegistroImportacion('inventario', file_path) as registro:
+        # Limpiar y procesar el archivo
+        df_productos = limpiar_inventario_csv(file_path, registro)
         
-        if producto_existente:
-            # Actualizar el producto existente
-            producto_existente.nombre = row['nombre']
-            producto_existente.unidad = row['unidad_normalizada']
-            producto_existente.cantidad_disponible = row['cantidad_normalizada']
-            producto_existente.fecha_vencimiento = row['vencimiento']
-            productos_actualizados += 1
-        else:
-            # Verificar si existe un producto maestro con el mismo código
-            producto_maestro = Producto.query.filter_by(
-                codigo=row['codigo'],
-                is_master=True
-            ).first()
-            
-            if producto_maestro and not producto_maestro.nombre:
-                # Actualizar el nombre del producto maestro si estaba vacío
-                producto_maestro.nombre = row['nombre']
-            
-            # Crear un nuevo producto de stock
-            nuevo_producto = Producto(
-                codigo=row['codigo'],
-                nombre=row['nombre'],
-                lote=row['lote'],
-                unidad=row['unidad_normalizada'],
-                cantidad_disponible=row['cantidad_normalizada'],
-                fecha_vencimiento=row['vencimiento'],
-                is_master=False  # Producto de stock
-            )
-            db.session.add(nuevo_producto)
-            productos_cargados += 1
+        productos_cargados = 0
+        productos_actualizados = 0
+        nombres_modificados = False  # Si cambia un nombre, las recetas cacheadas quedan viejas
+        nuevos = {}  # (código, lote) agregados en esta carga
+        movimientos = []  # Variaciones de stock para el libro de movimientos
+        conversiones = []  # Variaciones que solo corrigen la unidad de lotes viejos
+        nombres_nuevos = {}  # código -> nombre del primer lote nuevo, para los maestros sin nombre
+        
+        # Sin autoflush las consultas no escriben en la base, así la búsqueda y la
+        # escritura se miden por separado. Como tampoco ven los lotes agregados,
+        # un lote repetido en el archivo se busca en `nuevos`.
+        with registro.etapa('resolucion'), db.session.no_autoflush:
+            for _, row in df_productos.iterrows():
+                # Buscar si el producto ya existe por código y lote
+                clave = (row['codigo'], row['lote']) if pd.notna(row['lote']) else None
+                producto_existente = nuevos.get(clave) or Producto.query.filter_by(
+                    codigo=row['codigo'], 
+                    lote=row['lote'],
+                    is_master=False  # Solo buscar en productos de stock
+                ).first()
+                
+                lote = row['lote'] if clave is not None else None
+                if producto_existente:
+                    # Actualizar el producto existente
+                    if producto_existente.nombre != row['nombre']:
+                        nombres_modificados = True
+                    variacion = row['cantidad_normalizada'] - producto_existente.cantidad_disponible
+                    if variacion:
+                        # Un lote que guardó el importador anterior sin convertir (ver
+                        # convertir_unidades_guardadas) cambia solo de unidad, no de stock
+                        anterior = _como_importador_anterior(row['cantidad'], row['unidad'])
+                        solo_unidad = anterior == (producto_existente.unidad, producto_existente.cantidad_disponible)
+                        (conversiones if solo_unidad else movimientos).append({
+                            'codigo': row['codigo'], 'lote': lote,
+                            'unidad': row['unidad_normalizada'], 'cantidad': variacion})
+                    producto_existente.nombre = row['nombre']
+                    producto_existente.unidad = row['unidad_normalizada']
+                    producto_existente.cantidad_disponible = row['cantidad_normalizada']
+                    producto_existente.fecha_vencimiento = row['vencimiento']
+                    productos_actualizados += 1
+                else:
+                    # El producto maestro con el mismo código se completa después (ver _completar_maestros)
+                    nombres_nuevos.setdefault(row['codigo'], row['nombre'])
+                    
+                    # Crear un nuevo producto de stock
+                    nuevo_producto = Producto(
+                        codigo=row['codigo'],
+                        nombre=row['nombre'],
+                        lote=row['lote'],
+                        unidad=row['unidad_normalizada'],
+                        cantidad_disponible=row['cantidad_normalizada'],
+                        fecha_vencimiento=row['vencimiento'],
+                        is_master=False  # Producto de stock
+                    )
+                    db.session.add(nuevo_producto)
+                    if clave is not None:
+                        nuevos[clave] = nuevo_producto
+                    if row['cantidad_normalizada']:
+                        movimientos.append({'codigo': row['codigo'], 'lote': lote,
+                                            'unidad': row['unidad_normalizada'],
+                                            'cantidad': row['cantidad_normalizada']})
+                    productos_cargados += 1
+        
+        # Guardar los cambios en la base de datos
+        with registro.etapa('escritura'):
+            db.session.flush()
+            registrar_movimientos(movimientos, 'importacion', nombre_archivo(file_path))
+            registrar_movimientos(conversiones, 'conversion_unidades', nombre_archivo(file_path))
+        with registro.etapa('commit'):
+            db.session.commit()
+        # Los maestros están en la base principal aunque la carga sea de otro depósito.
+        # El stock ya está confirmado: un error acá no debe marcar la carga como fallida.
+        try:
+            if _completar_maestros(nombres_nuevos):
+                nombres_modificados = True
+        except Exception:
+            current_app.logger.exception('Stock de %s cargado, pero no se completaron los nombres de maestros',
+                                         registro.nombre)
+        
+        registro.registros_creados = productos_cargados
+        registro.registros_actualizados = productos_actualizados
     
-    # Guardar los cambios en la base de datos
-    db.session.commit()
+    if nombres_modificados:
+        invalidar_recetas()
+    incrementar_version_datos()
+    refrescar_resumen_vencimientos()
+    crear_punto_control_si_corresponde()
     
     return {
         'productos_cargados': productos_cargados,
@@ -171,180 +207,254 @@ def cargar_inventario_a_db(file_path):
     }
 
 
-def procesar_recetas_csv(file_path):
+def _completar_maestros(nombres):
+    """
+    Pone nombre a los productos maestros que no tenían, con el de su primer lote nuevo.
+    Corre en la base principal (donde están los maestros) y retorna si cambió alguno.
+    """
+    modificados = False
+    with en_deposito(DEPOSITO_PRINCIPAL):
+        for bloque in en_bloques(list(nombres)):
+            for maestro in Producto.query.filter(
+                Producto.codigo.in_(bloque), Producto.is_master.is_(True),
+                db.or_(Producto.nombre.is_(None), Producto.nombre == '')
+            ):
+                maestro.nombre = nombres[maestro.codigo]
+                modificados = True
+        if modificados:
+            db.session.commit()
+    return modificados
+
+
+def procesar_recetas_csv(file_path, registro=None):
     """
     Lee un archivo CSV o XLS de recetas y lo procesa.
-    Estructura del archivo:
-    - Receta: Col[1]="Artículo", Col[2]=código, Col[5]=nombre
-    - Componentes: Col[1]=número_paso, Col[12]=código, Col[14]=nombre, Col[16]=unidad, Col[17]=cantidad
+    El formato del archivo (libro de recetas del ERP o tabla plana) lo detecta
+    el registro de importadores. Retorna (recetas, columnas detectadas, mapeo campo -> columna).
     """
-    # Leer el archivo según su extensión
-    if file_path.lower().endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(file_path, engine='xlrd' if file_path.lower().endswith('.xls') else None, header=None)
-    else:
-        df = pd.read_csv(file_path, header=None)
-    
-    recetas_dict = {}
-    codigo_receta_actual = None
-    nombre_receta_actual = None
-    
-    for idx, row in df.iterrows():
-        # Verificar si esta fila define una nueva receta (tiene "Artículo" en columna 1)
-        if len(row) > 5 and pd.notna(row[1]) and 'artículo' in str(row[1]).lower():
-            # El código está en columna 2, nombre en columna 5
-            codigo = str(row[2]).strip() if pd.notna(row[2]) else None
-            nombre = str(row[5]).strip() if pd.notna(row[5]) else None
-            
-            # Validar que el código parece válido
-            if codigo and codigo != 'nan' and any(c.isdigit() for c in codigo):
-                codigo_receta_actual = codigo
-                nombre_receta_actual = nombre if nombre and nombre != 'nan' else codigo
-                
-                if codigo_receta_actual not in recetas_dict:
-                    recetas_dict[codigo_receta_actual] = {
-                        'nombre': nombre_receta_actual,
-                        'componentes': []
-                    }
-        
-        # Verificar si es una fila de componente
-        # Debe tener un número en col[1] (paso), datos en col[12] (código) y col[17] (cantidad)
-        elif codigo_receta_actual and len(row) > 17:
-            col_paso = str(row[1]).strip() if pd.notna(row[1]) else ''
-            col_codigo_comp = str(row[12]).strip() if pd.notna(row[12]) else ''
-            col_nombre_comp = str(row[14]).strip() if pd.notna(row[14]) else ''
-            col_unidad = str(row[16]).strip() if pd.notna(row[16]) else ''
-            col_cantidad = row[17] if pd.notna(row[17]) else None
-            
-            # Verificar que es una fila de componente válida
-            # Col[1] debe ser un número (paso)
-            # Col[12] debe tener código de componente
-            # Col[17] debe tener cantidad
-            if (col_paso.isdigit() and 
-                col_codigo_comp and 
-                col_codigo_comp != 'nan' and
-                col_cantidad is not None):
-                
-                try:
-                    # Convertir cantidad
-                    if isinstance(col_cantidad, str):
-                        cantidad = float(col_cantidad.replace(',', '.').replace(' ', ''))
-                    else:
-                        cantidad = float(col_cantidad)
-                    
-                    # Normalizar unidad
-                    unidad = normalizar_unidad(col_unidad) if col_unidad and col_unidad != 'nan' else 'uni'
-                    
-                    # Agregar componente
-                    recetas_dict[codigo_receta_actual]['componentes'].append({
-                        'codigo_producto': col_codigo_comp,
-                        'nombre_producto': col_nombre_comp if col_nombre_comp and col_nombre_comp != 'nan' else col_codigo_comp,
-                        'cantidad': cantidad,
-                        'unidad': unidad
-                    })
-                except (ValueError, AttributeError) as e:
-                    # Si no se puede convertir la cantidad, ignorar esta línea
-                    pass
-    
-    # Filtrar recetas vacías
-    recetas_dict = {k: v for k, v in recetas_dict.items() if v['componentes']}
-    
-    return recetas_dict, [], {}
+    registro = registro or RegistroImportacion('recetas', file_path)
+    recetas_dict, deteccion = importar('recetas', file_path, registro)
+    registro.filas_validas = sum(len(data['componentes']) for data in recetas_dict.values())
+    return recetas_dict, list(deteccion.mapa), dict(deteccion.mapa)
+
+
+def _sin_mayusculas(texto):
+    return texto.translate(_MINUSCULAS_ASCII)
+
+
+def _en_lotes(filas, tamano=TAMANO_LOTE_ESCRITURA):
+    for inicio in range(0, len(filas), tamano):
+        yield filas[inicio:inicio + tamano]
+
+
+def _recetas_existentes(codigos):
+    """{codigo: id} de las recetas de la carga que ya están en la base"""
+    existentes = {}
+    for bloque in en_bloques(codigos):
+        for receta_id, codigo in db.session.execute(
+            db.select(Receta.id, Receta.codigo).where(Receta.codigo.in_(bloque))
+        ):
+            existentes[codigo] = receta_id
+    return existentes
+
+
+def _componentes_guardados(receta_ids):
+    """{receta_id: [(id, producto_id, cantidad_necesaria, unidad), ...]} en orden de carga"""
+    componentes = {}
+    for bloque in en_bloques(receta_ids):
+        filas = db.session.execute(
+            db.select(RecetaComponente.id, RecetaComponente.receta_id, RecetaComponente.producto_id,
+                      RecetaComponente.cantidad_necesaria, RecetaComponente.unidad)
+            .where(RecetaComponente.receta_id.in_(bloque))
+            .order_by(RecetaComponente.id)
+        )
+        for componente_id, receta_id, producto_id, cantidad, unidad in filas:
+            componentes.setdefault(receta_id, []).append((componente_id, producto_id, cantidad, unidad))
+    return componentes
+
+
+def _productos_por_clave(columna, claves):
+    """{clave en minúsculas: id del primer producto (menor id)} buscando por código o nombre"""
+    productos = {}
+    for bloque in en_bloques(claves):
+        filas = db.session.execute(
+            db.select(Producto.id, columna).where(db.func.lower(columna).in_(bloque)).order_by(Producto.id)
+        )
+        for producto_id, valor in filas:
+            productos.setdefault(_sin_mayusculas(valor), producto_id)
+    return productos
+
+
+def _por_ocurrencia(codigo_receta, componentes):
+    """
+    Clave (receta, producto, n) de cada componente: n numera las veces que el mismo
+    producto aparece en la receta, así un producto repetido se compara uno a uno.
+    """
+    vistos = {}
+    for producto, valor in componentes:
+        n = vistos.get(producto, 0)
+        vistos[producto] = n + 1
+        yield (codigo_receta, producto, n), valor
 
 
 def cargar_recetas_a_db(file_path):
     """
-    Procesa un archivo de recetas y carga las recetas y componentes en la base de datos.
+    Procesa un archivo de recetas y concilia las recetas y componentes con la base:
+    solo se insertan, actualizan (cantidad o unidad) o eliminan los componentes que
+    cambiaron, y los que siguen igual conservan su fila y su id. Las recetas que no
+    vienen en el archivo no se tocan.
+    Cada carga queda registrada en el historial de importaciones con el tiempo de cada etapa.
     """
-    recetas_dict, columns, col_map = procesar_recetas_csv(file_path)
-    
-    # Debug info
-    total_recetas_procesadas = len(recetas_dict)
-    total_componentes = sum(len(data['componentes']) for data in recetas_dict.values())
-    
-    productos_encontrados = 0
-    productos_creados = 0
-    
-    for data in recetas_dict.values():
-        for comp in data['componentes']:
-            producto = Producto.query.filter(
-                (Producto.codigo.ilike(comp['codigo_producto'])) | 
-                (Producto.nombre.ilike(comp['codigo_producto']))
-            ).first()
-            if producto:
-                productos_encontrados += 1
-            else:
-                productos_creados += 1
-    
-    recetas_cargadas = 0
-    
-    for codigo_receta, data in recetas_dict.items():
-        # Verificar si la receta ya existe
-        receta_existente = Receta.query.filter_by(codigo=codigo_receta).first()
+    with RegistroImportacion('recetas', file_path) as registro:
+        recetas_dict, columns, col_map = procesar_recetas_csv(file_path, registro)
         
-        if receta_existente:
-            # Si la receta ya existe, eliminar sus componentes antiguos para recargarlos
-            RecetaComponente.query.filter_by(receta_id=receta_existente.id).delete()
-            db.session.flush()  # Asegurar que la eliminación se aplique antes de agregar nuevos
-            receta = receta_existente
-        else:
-            # Crear nueva receta
-            receta = Receta(
-                codigo=codigo_receta,
-                nombre=data['nombre']
-            )
-            db.session.add(receta)
-            db.session.flush()  # Para obtener el ID
+        # Debug info
+        total_recetas_procesadas = len(recetas_dict)
+        total_componentes = sum(len(data['componentes']) for data in recetas_dict.values())
         
-        # Agregar componentes
-        componentes_agregados = 0
-        for comp in data['componentes']:
-            codigo_producto = comp['codigo_producto'].strip()
-            nombre_producto = comp.get('nombre_producto', codigo_producto)
+        # Toda la lectura va antes de la primera escritura: el lock de escritura de
+        # SQLite se toma recién al aplicar los cambios
+        with registro.etapa('resolucion'), db.session.no_autoflush:
+            existentes = _recetas_existentes(list(recetas_dict))
+            guardados = _componentes_guardados(list(existentes.values()))
+            
+            # Productos: primero por código y, si no está, por nombre (sin distinguir mayúsculas)
+            componentes_archivo = [
+                (codigo_receta, comp['codigo_producto'].strip(),
+                 comp.get('nombre_producto', comp['codigo_producto'].strip()), comp)
+                for codigo_receta, data in recetas_dict.items()
+                for comp in data['componentes']
+            ]
+            por_codigo = _productos_por_clave(
+                Producto.codigo, {_sin_mayusculas(codigo) for _, codigo, _, _ in componentes_archivo}
+            )
+            por_nombre = _productos_por_clave(
+                Producto.nombre, {_sin_mayusculas(nombre) for _, codigo, nombre, _ in componentes_archivo
+                                  if nombre and _sin_mayusculas(codigo) not in por_codigo}
+            )
+            
+            productos_encontrados = 0
+            productos_creados = 0
+            productos_nuevos = []  # Productos maestros a crear (todavía sin id)
+            por_receta = {codigo_receta: [] for codigo_receta in recetas_dict}
+            for codigo_receta, codigo_producto, nombre_producto, comp in componentes_archivo:
+                clave_codigo = _sin_mayusculas(codigo_producto)
+                producto = por_codigo.get(clave_codigo)
+                if producto is None and nombre_producto:
+                    producto = por_nombre.get(_sin_mayusculas(nombre_producto))
+                
+                if isinstance(producto, int):
+                    productos_encontrados += 1
+                else:
+                    productos_creados += 1
+                    if producto is None:
+                        # Crear el producto maestro si no existe; los componentes
+                        # siguientes con el mismo código o nombre lo usan
+                        producto = Producto(
+                            codigo=codigo_producto,
+                            nombre=nombre_producto,  # Usar el nombre del archivo o el código
+                            unidad=comp['unidad'],
+                            cantidad_disponible=0,  # Sin stock inicialmente
+                            fecha_vencimiento=None,
+                            lote=None,
+                            is_master=True  # Producto maestro creado desde recetas
+                        )
+                        productos_nuevos.append(producto)
+                        por_codigo[clave_codigo] = producto
+                        if nombre_producto:
+                            por_nombre.setdefault(_sin_mayusculas(nombre_producto), producto)
+                por_receta[codigo_receta].append((producto, (comp['cantidad'], comp['unidad'])))
             
-            # Buscar el producto primero por código exacto (case insensitive)
-            producto = Producto.query.filter(Producto.codigo.ilike(codigo_producto)).first()
+            # Diferencias: conjuntos de claves (receta, producto, n) del archivo y de la base
+            en_archivo = {}
+            for codigo_receta, componentes in por_receta.items():
+                en_archivo.update(_por_ocurrencia(codigo_receta, componentes))
+            en_base = {}
+            codigos_por_id = {receta_id: codigo for codigo, receta_id in existentes.items()}
+            for receta_id, componentes in guardados.items():
+                en_base.update(_por_ocurrencia(
+                    codigos_por_id[receta_id],
+                    [(producto_id, (componente_id, cantidad, unidad))
+                     for componente_id, producto_id, cantidad, unidad in componentes]
+                ))
             
-            # Si no se encuentra por código, buscar por nombre exacto
-            if not producto and nombre_producto:
-                producto = Producto.query.filter(Producto.nombre.ilike(nombre_producto)).first()
+            claves_nuevas = en_archivo.keys() - en_base.keys()
+            claves_eliminadas = en_base.keys() - en_archivo.keys()
+            claves_comunes = en_archivo.keys() & en_base.keys()
             
-            if not producto:
-                # Crear el producto maestro si no existe
-                producto = Producto(
-                    codigo=codigo_producto,
-                    nombre=nombre_producto,  # Usar el nombre del archivo o el código
-                    unidad=comp['unidad'],
-                    cantidad_disponible=0,  # Sin stock inicialmente
-                    fecha_vencimiento=None,
-                    lote=None,
-                    is_master=True  # Producto maestro creado desde recetas
-                )
-                db.session.add(producto)
-                db.session.flush()  # Para obtener el ID
+            # En el orden del archivo, para que los componentes nuevos queden en ese orden
+            agregar = [clave for clave in en_archivo if clave in claves_nuevas]
+            eliminar = [en_base[clave][0] for clave in claves_eliminadas]
+            actualizar = []
+            for clave in claves_comunes:
+                componente_id, cantidad, unidad = en_base[clave]
+                if en_archivo[clave] != (cantidad, unidad):
+                    cantidad_nueva, unidad_nueva = en_archivo[clave]
+                    actualizar.append((clave, {'id': componente_id, 'cantidad_necesaria': cantidad_nueva,
+                                               'unidad': unidad_nueva}))
             
-            componente = RecetaComponente(
-                receta_id=receta.id,
-                producto_id=producto.id,
-                cantidad_necesaria=comp['cantidad'],
-                unidad=comp['unidad']
-            )
-            db.session.add(componente)
-            componentes_agregados += 1
+            recetas_con_cambios = {clave[0] for clave in claves_nuevas | claves_eliminadas}
+            recetas_con_cambios.update(clave[0] for clave, _ in actualizar)
+            actualizar = [fila for _, fila in actualizar]
         
-        if componentes_agregados > 0:
-            recetas_cargadas += 1
-        elif not receta_existente:
-            # Si no se agregaron componentes y es nueva, eliminar la receta
-            db.session.delete(receta)
+        with registro.etapa('escritura'):
+            recetas_nuevas = [
+                Receta(codigo=codigo_receta, nombre=data['nombre'])
+                for codigo_receta, data in recetas_dict.items() if codigo_receta not in existentes
+            ]
+            if recetas_nuevas or productos_nuevos:
+                db.session.add_all(productos_nuevos)
+                db.session.add_all(recetas_nuevas)
+                db.session.flush()  # Para obtener los ids
+            ids_recetas = dict(existentes)
+            ids_recetas.update((receta.codigo, receta.id) for receta in recetas_nuevas)
+            
+            for bloque in en_bloques(eliminar):
+                db.session.execute(
+                    db.delete(RecetaComponente).where(RecetaComponente.id.in_(bloque)),
+                    execution_options={'synchronize_session': False}
+                )
+            for lote in _en_lotes(actualizar):
+                db.session.execute(db.update(RecetaComponente), lote)
+            filas_nuevas = []
+            for clave in agregar:
+                codigo_receta, producto, _ = clave
+                cantidad, unidad = en_archivo[clave]
+                filas_nuevas.append({
+                    'receta_id': ids_recetas[codigo_receta],
+                    'producto_id': producto if isinstance(producto, int) else producto.id,
+                    'cantidad_necesaria': cantidad,
+                    'unidad': unidad,
+                })
+            for lote in _en_lotes(filas_nuevas):
+                db.session.execute(db.insert(RecetaComponente), lote)
+        with registro.etapa('commit'):
+            db.session.commit()
+        
+        recetas_modificadas = [ids_recetas[codigo] for codigo in recetas_dict if codigo in recetas_con_cambios]
+        recetas_actualizadas = sum(1 for codigo in recetas_con_cambios if codigo in existentes)
+        registro.registros_creados = len(recetas_nuevas)
+        registro.registros_actualizados = recetas_actualizadas
     
-    db.session.commit()
+    if recetas_modificadas or productos_nuevos:
+        # Solo las recetas que cambiaron se vuelven a renderizar en /recetas
+        marcar_recetas_modificadas(recetas_modificadas)
+        incrementar_version_datos()
     
     return {
-        'recetas_cargadas': recetas_cargadas,
+        'recetas_cargadas': total_recetas_procesadas,
         'total_recetas_procesadas': total_recetas_procesadas,
         'total_componentes': total_componentes,
         'productos_encontrados': productos_encontrados,
         'productos_creados': productos_creados,
         'columnas_detectadas': columns,
-        'mapeo_columnas': col_map
-    }
\ No newline at end of file
+        'mapeo_columnas': col_map,
+        # Diferencias aplicadas
+        'recetas_nuevas': len(recetas_nuevas),
+        'recetas_actualizadas': recetas_actualizadas,
+        'recetas_sin_cambios': total_recetas_procesadas - len(recetas_modificadas),
+        'componentes_agregados': len(filas_nuevas),
+        'componentes_actualizados': len(actualizar),
+        'componentes_eliminados': len(eliminar),
+        'componentes_sin_cambios': len(claves_comunes) - len(actualizar),
+    }
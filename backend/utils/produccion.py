@@ -0,0 +1,224 @@
+from collections import namedtuple
+from datetime import datetime
+import math
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.alertas import DIAS_PROXIMO_VENCER
+from utils.cache import version_datos
+from utils.lecturas import componentes_de_recetas, productos_por_id, lotes_por_codigo
+from utils.unidades import factor, UNO
+
+MICROSEGUNDOS_POR_DIA = 86_400_000_000
+
+# Lotes de un producto pasados a una unidad de referencia:
+# - filas: los lotes (para el detalle), del que vence primero al último
+# - cantidades: cantidad de cada lote en la unidad de referencia (0 si no se puede convertir)
+# - totales: cantidad para mostrar (convertida, o la original si no se puede convertir)
+# - convertibles: si la unidad del lote es de la misma magnitud que la de referencia
+# - vencimientos: datetime64 (NaT sin fecha)
+LotesConvertidos = namedtuple('LotesConvertidos', 'filas cantidades totales convertibles vencimientos')
+
+# (código, unidad de referencia) -> LotesConvertidos, válidos mientras no cambien los datos
+_cache_lotes = {'version': None, 'productos': {}}
+_lock = threading.Lock()
+
+
+def _convertir_lotes(filas, unidad):
+    import numpy as np
+
+    factores = [factor(fila.unidad, unidad) for fila in filas]
+    convertibles = np.array([f is not None for f in factores], dtype=bool)
+    totales = np.array([
+        fila.cantidad_disponible * f.numerador / f.denominador if f is not None else fila.cantidad_disponible
+        for fila, f in zip(filas, factores)
+    ], dtype=float)
+    return LotesConvertidos(
+        filas,
+        np.where(convertibles, totales, 0.0),
+        totales,
+        convertibles,
+        np.array([fila.fecha_vencimiento for fila in filas], dtype='datetime64[us]'),
+    )
+
+
+def lotes_convertidos(pedidos):
+    """
+    {(codigo, unidad): LotesConvertidos} para cada (código, unidad de referencia) pedido.
+    Se guardan en memoria hasta que cambian los datos (cargas, vaciados).
+    """
+    version = version_datos()[0]
+    with _lock:
+        if _cache_lotes['version'] != version:
+            _cache_lotes['version'] = version
+            _cache_lotes['productos'] = {}
+        guardados = _cache_lotes['productos']
+        resultado = {clave: guardados[clave] for clave in pedidos if clave in guardados}
+
+    faltantes = [clave for clave in pedidos if clave not in resultado]
+    if faltantes:
+        lotes = lotes_por_codigo({codigo for codigo, _ in faltantes})
+        nuevos = {(codigo, unidad): _convertir_lotes(lotes.get(codigo, []), unidad) for codigo, unidad in faltantes}
+        with _lock:
+            # Si los datos cambiaron mientras se leía, no se guardan
+            if _cache_lotes['version'] == version:
+                _cache_lotes['productos'].update(nuevos)
+        resultado.update(nuevos)
+    return resultado
+
+
+def leer_seleccion(recetas_seleccionadas):
+    """
+    [(receta_id, cantidad)] de la lista recibida en el pedido. Lanza ValueError si no es
+    una lista de dicts con 'id' entero y 'cantidad' numérica mayor que 0.
+    """
+    if not isinstance(recetas_seleccionadas, list):
+        raise ValueError('recetas debe ser una lista')
+    seleccion = []
+    for receta_data in recetas_seleccionadas:
+        try:
+            receta_id = int(receta_data['id'])
+            cantidad = float(receta_data['cantidad'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cada receta debe tener id entero y cantidad numérica')
+        if not math.isfinite(cantidad) or cantidad <= 0:
+            raise ValueError('La cantidad de cada receta debe ser mayor que 0')
+        seleccion.append((receta_id, cantidad))
+    return seleccion
+
+
+def calcular_produccion_recetas(recetas_seleccionadas):
+    """
+    Calcula si se pueden producir las recetas seleccionadas con el stock actual.
+    Recibe una lista de dicts con 'id' y 'cantidad' (ver leer_seleccion) y retorna un dict con
+    'puede_producir' y los 'detalles' por producto (incluyendo sus lotes).
+    Cada producto se calcula en la unidad de su primer componente; los componentes
+    y lotes en otra unidad de la misma magnitud se convierten (Kg, g, mg...).
+    """
+    import numpy as np
+
+    # Componentes de todas las recetas elegidas en una sola consulta (solo columnas)
+    seleccion = leer_seleccion(recetas_seleccionadas)
+    componentes = componentes_de_recetas({receta_id for receta_id, _ in seleccion})
+
+    # Una fila por componente usado: producto, cantidad y factor a la unidad del producto
+    posiciones = {}  # producto_id -> posición
+    unidades = []
+    incompatibles = set()
+    indices, cantidades, numeradores, denominadores = [], [], [], []
+    for receta_id, cantidad in seleccion:
+        for producto_id, cantidad_por_unidad, unidad in componentes.get(receta_id, ()):
+            posicion = posiciones.get(producto_id)
+            if posicion is None:
+                posicion = posiciones[producto_id] = len(unidades)
+                unidades.append(unidad)
+            conversion = factor(unidad, unidades[posicion])
+            if conversion is None:
+                # No se puede convertir: se suma tal cual y se avisa en el detalle
+                incompatibles.add(posicion)
+                conversion = UNO
+            indices.append(posicion)
+            cantidades.append(cantidad_por_unidad * cantidad)
+            numeradores.append(conversion.numerador)
+            denominadores.append(conversion.denominador)
+
+    # Cantidad total de cada producto necesario (en la unidad del producto)
+    necesarios = np.bincount(
+        np.array(indices, dtype=np.intp),
+        weights=np.array(cantidades, dtype=float) * np.array(numeradores) / np.array(denominadores),
+        minlength=len(unidades),
+    )
+
+    # Productos y lotes de stock de todos los códigos necesarios, ordenados por vencimiento
+    referencias = productos_por_id(posiciones)
+    productos = [
+        (producto_id, posicion, referencias[producto_id])
+        for producto_id, posicion in posiciones.items() if producto_id in referencias
+    ]
+    por_producto = lotes_convertidos([(ref.codigo, unidades[posicion]) for _, posicion, ref in productos])
+    bloques = [por_producto[(ref.codigo, unidades[posicion])] for _, posicion, ref in productos]
+
+    # Todos los lotes en arrays planos; `indice` dice a qué producto pertenece cada lote
+    fecha_actual = datetime.now()
+    ahora = np.datetime64(fecha_actual, 'us')
+    largos = np.array([len(bloque.filas) for bloque in bloques], dtype=np.intp)
+    indice = np.repeat(np.arange(len(bloques)), largos)
+    inicios = np.concatenate(([0], np.cumsum(largos)[:-1])).astype(np.intp)
+
+    def unir(campo, tipo):
+        return np.concatenate([getattr(b, campo) for b in bloques]) if bloques else np.zeros(0, dtype=tipo)
+
+    cantidades_lote = unir('cantidades', float)
+    convertibles = unir('convertibles', bool)
+    vencimientos = unir('vencimientos', 'datetime64[us]')
+
+    sin_fecha = np.isnat(vencimientos)
+    vencidos = ~sin_fecha & (vencimientos < ahora)
+    usables = np.where(vencidos | ~convertibles, 0.0, cantidades_lote)
+    disponibles = np.bincount(indice, weights=usables, minlength=len(bloques))
+
+    # Asignación FEFO (primero vence, primero sale). Los lotes de cada producto ya vienen
+    # del que vence primero al último, así que equivale a recorrerlos en orden haciendo
+    #     usar = min(falta, lote); falta -= usar
+    # En arrays: lo que ya cubrieron los lotes anteriores es la suma acumulada hasta el
+    # lote previo, y cada lote aporta lo que falta después de eso, entre 0 y lo que tiene.
+    a_usar = np.zeros_like(usables)
+    for numero, (_, posicion, _) in enumerate(productos):
+        desde = inicios[numero]
+        lotes = usables[desde:desde + largos[numero]]
+        cubierto_antes = np.concatenate(([0.0], np.cumsum(lotes)[:-1]))
+        falta = necesarios[posicion] - cubierto_antes
+        a_usar[desde:desde + largos[numero]] = np.minimum(np.maximum(falta, 0.0), lotes)
+
+    diferencia = np.where(sin_fecha, np.timedelta64(0, 'us'), vencimientos - ahora).astype(np.int64)
+    proximos = ~sin_fecha & ~vencidos & (diferencia // MICROSEGUNDOS_POR_DIA < DIAS_PROXIMO_VENCER)
+
+    a_usar, totales = a_usar.tolist(), unir('totales', float).tolist()
+    vencidos, proximos, convertibles = vencidos.tolist(), proximos.tolist(), convertibles.tolist()
+
+    puede_producir = True
+    detalles = []
+
+    for numero, (producto_id, posicion, producto_referencia) in enumerate(productos):
+        cantidad_necesaria = float(necesarios[posicion])
+        cantidad_disponible = float(disponibles[numero])
+        unidad = unidades[posicion]
+
+        # Preparar lista de todos los lotes (para mostrar en detalles)
+        todos_los_lotes = []
+        for i, producto in enumerate(bloques[numero].filas, start=int(inicios[numero])):
+            lote = {
+                'lote': producto.lote or 'S/L',
+                'deposito': producto.deposito,
+                'cantidad': a_usar[i],
+                'cantidad_total': totales[i],
+                'vencimiento': producto.fecha_vencimiento.strftime('%Y-%m-%d') if producto.fecha_vencimiento else 'N/A',
+                'vencido': vencidos[i],
+                'proximo_vencer': proximos[i]
+            }
+            if not convertibles[i]:
+                lote['unidad_incompatible'] = producto.unidad
+            todos_los_lotes.append(lote)
+
+        detalle = {
+            'producto': producto_referencia.nombre or producto_referencia.codigo,
+            'unidad': unidad,
+            'necesario': cantidad_necesaria,
+            'disponible': cantidad_disponible,
+            'lotes': todos_los_lotes,
+        }
+        if posicion in incompatibles:
+            detalle['unidades_incompatibles'] = True
+        if cantidad_disponible < cantidad_necesaria:
+            puede_producir = False
+            detalle['faltante'] = cantidad_necesaria - cantidad_disponible
+            detalle['estado'] = 'insuficiente'
+        else:
+            detalle['estado'] = 'suficiente'
+        detalles.append(detalle)
+
+    return {
+        'puede_producir': puede_producir,
+        'detalles': detalles
+    }
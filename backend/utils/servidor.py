@@ -0,0 +1,91 @@
+import argparse
+import os
+import socket
+import threading
+import time
+import webbrowser
+
+MODOS = ('produccion', 'desarrollo')
+
+
+def leer_configuracion(argv=None, modo_por_defecto='produccion'):
+    """
+    Lee la configuración del servidor desde la línea de comandos.
+    Cada opción puede venir también de una variable de entorno APPLAB_*.
+    """
+    parser = argparse.ArgumentParser(description='Servidor de AppLab')
+    parser.add_argument('--modo', choices=MODOS,
+                        default=os.environ.get('APPLAB_MODO', modo_por_defecto),
+                        help='produccion (waitress, multi-hilo) o desarrollo (servidor de Werkzeug)')
+    parser.add_argument('--host', default=os.environ.get('APPLAB_HOST', '127.0.0.1'))
+    parser.add_argument('--puerto', type=int, default=int(os.environ.get('APPLAB_PUERTO', 5000)))
+    parser.add_argument('--hilos', type=int, default=int(os.environ.get('APPLAB_HILOS', 8)),
+                        help='Hilos que atienden pedidos en modo produccion')
+    parser.add_argument('--backlog', type=int, default=int(os.environ.get('APPLAB_BACKLOG', 1024)),
+                        help='Conexiones pendientes que acepta el socket')
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('APPLAB_TIMEOUT', 120)),
+                        help='Segundos que se mantiene una conexión inactiva')
+    parser.add_argument('--sin-navegador', action='store_true',
+                        default=os.environ.get('APPLAB_SIN_NAVEGADOR') == '1',
+                        help='No abrir el navegador al iniciar')
+    parser.add_argument('--perfil-inicio', action='store_true',
+                        help='Mostrar tiempos de import y hasta el primer pedido (también APPLAB_PERFIL_INICIO=1)')
+    # parse_known_args: PyInstaller y multiprocessing pueden agregar argumentos propios
+    config, _ = parser.parse_known_args(argv)
+    return config
+
+
+def esperar_servidor(host, puerto, timeout=15.0, intervalo=0.05):
+    """
+    Espera hasta que el servidor acepte conexiones.
+    Retorna True si quedó listo antes del timeout.
+    """
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection((host, puerto), timeout=intervalo * 4):
+                return True
+        except OSError:
+            time.sleep(intervalo)
+    return False
+
+
+def abrir_navegador_al_iniciar(host, puerto):
+    """Abre el navegador en un thread apenas el servidor está listo (sin esperas fijas)"""
+    def abrir():
+        if esperar_servidor(host, puerto):
+            webbrowser.open(f'http://{host}:{puerto}')
+
+    threading.Thread(target=abrir, daemon=True).start()
+
+
+def iniciar_servidor(app, config):
+    """
+    Inicia el servidor en el modo elegido. Bloquea hasta que se detiene.
+    Si waitress no está instalado se usa el servidor de desarrollo.
+    """
+    if config.modo == 'produccion':
+        try:
+            from waitress import serve
+        except ImportError:
+            print("waitress no está instalado, usando el servidor de desarrollo")
+        else:
+            serve(
+                app,
+                host=config.host,
+                port=config.puerto,
+                threads=config.hilos,
+                backlog=config.backlog,
+                channel_timeout=config.timeout,
+                connection_limit=max(100, config.hilos * 25),
+                ident='AppLab',
+            )
+            return
+
+    app.run(
+        debug=False,
+        use_reloader=False,
+        host=config.host,
+        port=config.puerto,
+        threaded=True
+    )
@@ -0,0 +1,84 @@
+"""
+Registro de unidades de medida.
+
+Cada unidad conocida pertenece a una magnitud (masa, volumen, cantidad) y vale
+una fracción exacta de la unidad canónica de esa magnitud (g, L, uni), que es
+como se guardan el stock y los componentes de recetas. Los factores entre cada
+par de unidades se calculan una sola vez, al importar el módulo, como
+(numerador, denominador): convertir es `cantidad * numerador / denominador`,
+así pasar de ml a L da exactamente lo mismo que dividir por 1000.
+"""
+from collections import namedtuple
+from fractions import Fraction
+
+CANONICAS = {'masa': 'g', 'volumen': 'L', 'cantidad': 'uni'}
+
+# Unidad (en minúsculas) -> (magnitud, cuántas unidades canónicas es una)
+_UNIDADES = {}
+for _nombres, _magnitud, _valor in (
+    (('g', 'gr', 'gramo', 'gramos'), 'masa', Fraction(1)),
+    (('kg', 'kilo', 'kilos', 'kilogramo', 'kilogramos'), 'masa', Fraction(1000)),
+    (('mg', 'miligramo', 'miligramos'), 'masa', Fraction(1, 1000)),
+    (('l', 'litro', 'litros'), 'volumen', Fraction(1)),
+    (('ml', 'mililitro', 'mililitros', 'cc'), 'volumen', Fraction(1, 1000)),
+    (('uni', 'unidad', 'unidades', 'u'), 'cantidad', Fraction(1)),
+):
+    for _nombre in _nombres:
+        _UNIDADES[_nombre] = (_magnitud, _valor)
+
+Factor = namedtuple('Factor', 'numerador denominador')
+UNO = Factor(1.0, 1.0)
+
+# (desde, hasta) -> Factor, para todo par de unidades conocidas de la misma magnitud
+_FACTORES = {}
+for _desde, (_magnitud_desde, _valor_desde) in _UNIDADES.items():
+    for _hasta, (_magnitud_hasta, _valor_hasta) in _UNIDADES.items():
+        if _magnitud_desde == _magnitud_hasta:
+            _relacion = _valor_desde / _valor_hasta
+            _FACTORES[(_desde, _hasta)] = Factor(float(_relacion.numerator), float(_relacion.denominator))
+
+
+def unidades_conocidas():
+    """Nombres (en minúsculas) de todas las unidades del registro"""
+    return list(_UNIDADES)
+
+
+def _clave(unidad):
+    return str(unidad).strip().lower()
+
+
+def normalizar_unidad(unidad):
+    """
+    Unidad canónica en la que se guarda una cantidad expresada en `unidad`
+    (g, L o uni). Una unidad desconocida queda como está, en minúsculas.
+    """
+    clave = _clave(unidad)
+    conocida = _UNIDADES.get(clave)
+    return CANONICAS[conocida[0]] if conocida else clave
+
+
+def factor(desde, hasta):
+    """Factor para pasar de `desde` a `hasta`, o None si son de distinta magnitud"""
+    desde, hasta = _clave(desde), _clave(hasta)
+    encontrado = _FACTORES.get((desde, hasta))
+    if encontrado is not None:
+        return encontrado
+    # Unidades desconocidas: solo se corresponden consigo mismas
+    return UNO if desde == hasta else None
+
+
+def a_canonica(unidad):
+    """(unidad canónica, factor para llevar una cantidad en `unidad` a ella)"""
+    canonica = normalizar_unidad(unidad)
+    return canonica, factor(unidad, canonica) or UNO
+
+
+def convertir_cantidad(cantidad, unidad_original, unidad_destino):
+    """
+    Convierte la cantidad de una unidad a otra.
+    Si las unidades no son de la misma magnitud se retorna la cantidad sin convertir.
+    """
+    conversion = factor(unidad_original, unidad_destino)
+    if conversion is None or conversion == UNO:
+        return cantidad
+    return cantidad * conversion.numerador / conversion.denominador
@@ -0,0 +1,84 @@
+import gzip
+from datetime import datetime, date, time, timezone
+from functools import wraps
+from flask import request, session, make_response
+from werkzeug.http import is_resource_modified
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.cache import version_datos
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional, sin él se usa gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = {'text/html', 'application/json', 'text/css', 'application/javascript'}
+
+
+def _validadores_actuales():
+    """
+    ETag y Last-Modified de las páginas de datos. Incluyen el día actual
+    porque los estados de vencimiento cambian con la fecha aunque los datos no.
+    """
+    etag, ultima_modificacion = version_datos()
+    hoy = date.today()
+    inicio_dia = datetime.combine(hoy, time.min).astimezone(timezone.utc)
+    return f'{etag}-{hoy.isoformat()}', max(ultima_modificacion, inicio_dia)
+
+
+def respuesta_condicional(vista):
+    """
+    Decorador para páginas que solo dependen de los datos cargados.
+    Responde 304 si el navegador ya tiene la versión actual.
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        # Con mensajes flash pendientes la página siempre se renderiza
+        if session.get('_flashes'):
+            return vista(*args, **kwargs)
+
+        etag, ultima_modificacion = _validadores_actuales()
+        if not is_resource_modified(request.environ, etag=etag, last_modified=ultima_modificacion):
+            respuesta = make_response('', 304)
+        else:
+            respuesta = make_response(vista(*args, **kwargs))
+
+        respuesta.set_etag(etag, weak=True)
+        respuesta.last_modified = ultima_modificacion
+        respuesta.cache_control.no_cache = True
+        return respuesta
+    return envoltura
+
+
+def registrar_compresion(app):
+    """Comprime con brotli o gzip las respuestas HTML/JSON grandes."""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+
+    @app.after_request
+    def comprimir_respuesta(respuesta):
+        if (respuesta.status_code != 200
+                or respuesta.direct_passthrough
+                or respuesta.is_streamed
+                or 'Content-Encoding' in respuesta.headers
+                or respuesta.mimetype not in TIPOS_COMPRIMIBLES):
+            return respuesta
+
+        respuesta.vary.add('Accept-Encoding')
+        if respuesta.content_length is not None and respuesta.content_length < app.config['COMPRESS_MIN_SIZE']:
+            return respuesta
+
+        aceptadas = request.accept_encodings
+        if brotli is not None and aceptadas['br']:
+            datos = brotli.compress(respuesta.get_data(), quality=min(app.config['COMPRESS_LEVEL'], 11))
+            codificacion = 'br'
+        elif aceptadas['gzip']:
+            datos = gzip.compress(respuesta.get_data(), compresslevel=app.config['COMPRESS_LEVEL'])
+            codificacion = 'gzip'
+        else:
+            return respuesta
+
+        respuesta.set_data(datos)
+        respuesta.headers['Content-Encoding'] = codificacion
+        return respuesta
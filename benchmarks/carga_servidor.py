@@ -0,0 +1,107 @@
+"""
+Prueba de carga del servidor de AppLab.
+
+Levanta backend/run_exe.py en el modo indicado, lanza pedidos concurrentes
+contra las páginas de datos y reporta pedidos por segundo y latencias.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/carga_servidor.py --modo produccion
+    python benchmarks/carga_servidor.py --modo desarrollo
+    python benchmarks/carga_servidor.py --modo ambos --clientes 32 --duracion 20
+
+Las páginas se sirven desde la base actual (backend/instance/app.db), así que
+conviene cargar stock y recetas antes de medir.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'backend'))
+from utils.servidor import esperar_servidor
+
+RUTAS_POR_DEFECTO = ['/', '/stock', '/recetas', '/produccion']
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _cliente(url_base, rutas, fin, latencias, errores):
+    i = 0
+    while time.monotonic() < fin:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url_base + ruta, timeout=30) as respuesta:
+                respuesta.read()
+            latencias.append(time.perf_counter() - inicio)
+        except Exception:
+            errores.append(ruta)
+
+
+def medir(modo, clientes, duracion, rutas, hilos):
+    """Levanta el servidor en el modo pedido y mide durante `duracion` segundos."""
+    puerto = _puerto_libre()
+    comando = [sys.executable, os.path.join(RAIZ, 'backend', 'run_exe.py'),
+               '--modo', modo, '--puerto', str(puerto), '--hilos', str(hilos), '--sin-navegador']
+    proceso = subprocess.Popen(comando, cwd=os.path.join(RAIZ, 'backend'),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not esperar_servidor('127.0.0.1', puerto, timeout=30):
+            raise RuntimeError(f'El servidor en modo {modo} no respondió')
+
+        latencias, errores = [], []
+        fin = time.monotonic() + duracion
+        hilos_cliente = [
+            threading.Thread(target=_cliente, args=(f'http://127.0.0.1:{puerto}', rutas, fin, latencias, errores))
+            for _ in range(clientes)
+        ]
+        inicio = time.perf_counter()
+        for h in hilos_cliente:
+            h.start()
+        for h in hilos_cliente:
+            h.join()
+        transcurrido = time.perf_counter() - inicio
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+    latencias.sort()
+    return {
+        'modo': modo,
+        'clientes': clientes,
+        'pedidos': len(latencias),
+        'errores': len(errores),
+        'pedidos_por_segundo': round(len(latencias) / transcurrido, 1),
+        'latencia_p50_ms': round(statistics.median(latencias) * 1000, 1) if latencias else None,
+        'latencia_p95_ms': round(latencias[int(len(latencias) * 0.95) - 1] * 1000, 1) if latencias else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modo', choices=['produccion', 'desarrollo', 'ambos'], default='ambos')
+    parser.add_argument('--clientes', type=int, default=16, help='Clientes concurrentes')
+    parser.add_argument('--duracion', type=float, default=10, help='Segundos de medición por modo')
+    parser.add_argument('--hilos', type=int, default=8, help='Hilos del servidor en modo produccion')
+    parser.add_argument('--rutas', nargs='+', default=RUTAS_POR_DEFECTO)
+    args = parser.parse_args()
+
+    modos = ['desarrollo', 'produccion'] if args.modo == 'ambos' else [args.modo]
+    resultados = [medir(modo, args.clientes, args.duracion, args.rutas, args.hilos) for modo in modos]
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
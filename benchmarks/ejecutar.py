@@ -0,0 +1,223 @@
+"""
+Suite de benchmarks de AppLab.
+
+Para cada tamaño genera (o reutiliza) un inventario y un libro de recetas
+sintéticos, los carga en una base SQLite temporal y mide:
+
+- parseo: limpiar_inventario_csv y procesar_recetas_csv
+- carga: cargar_inventario_a_db y cargar_recetas_a_db
+- /calcular-produccion con 1, 10 y 50 recetas
+- renderizado de /stock, /recetas y /produccion (primera visita y repetida)
+- pico de memoria de Python (tracemalloc) al renderizar /stock y /recetas y al
+  calcular 50 recetas, también expresado por cada 10k lotes de inventario
+
+Los resultados se guardan en JSON (uno por ejecución) para comparar versiones.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/ejecutar.py --tamanos 1000 10000
+    python benchmarks/ejecutar.py --tamanos 100000 --formato xlsx
+    python benchmarks/ejecutar.py --tamanos 1000 --comparar benchmarks/resultados/anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_DATOS = os.path.join(RAIZ, 'benchmarks', 'datos')
+DIR_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+sys.path.insert(0, os.path.join(RAIZ, 'backend'))
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+from generadores import generar_inventario, generar_recetas
+
+SEMILLA = 42
+
+
+def _cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def _repetir(funcion, repeticiones):
+    """Ejecuta varias veces y retorna la mediana en segundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def _memoria_pico(funcion):
+    """Pico de memoria asignada por Python durante la llamada, en KB (fuera de las mediciones de tiempo)"""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _archivos(tamano, formato):
+    """Genera los archivos de prueba si no existen (se reutilizan entre ejecuciones)."""
+    productos = max(50, tamano // 4)
+    inventario = os.path.join(DIR_DATOS, f'inventario_{tamano}_{SEMILLA}.{formato}')
+    recetas = os.path.join(DIR_DATOS, f'recetas_{tamano}_{SEMILLA}.{formato}')
+    if not os.path.exists(inventario):
+        generar_inventario(inventario, tamano, productos=productos, semilla=SEMILLA)
+    if not os.path.exists(recetas):
+        generar_recetas(recetas, tamano, productos=productos, semilla=SEMILLA)
+    return inventario, recetas
+
+
+def _commit_actual():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def medir_tamano(app, db, tamano, formato, repeticiones):
+    from models import Receta
+    from utils.cache import invalidar_recetas, incrementar_version_datos
+    from utils.processing import (
+        limpiar_inventario_csv, cargar_inventario_a_db,
+        procesar_recetas_csv, cargar_recetas_a_db
+    )
+
+    inventario, recetas = _archivos(tamano, formato)
+    tiempos = {}
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Igual que /resetear-db: descartar lo cacheado de la medición anterior
+        invalidar_recetas()
+        incrementar_version_datos()
+
+        tiempos['parseo_inventario'], df = _cronometrar(limpiar_inventario_csv, inventario)
+        tiempos['parseo_recetas'], (recetas_dict, _, _) = _cronometrar(procesar_recetas_csv, recetas)
+        tiempos['carga_inventario'], _ = _cronometrar(cargar_inventario_a_db, inventario)
+        tiempos['carga_recetas'], _ = _cronometrar(cargar_recetas_a_db, recetas)
+        # Segunda carga del mismo libro: el caso típico de "volver a subir todo"
+        tiempos['recarga_recetas'], _ = _cronometrar(cargar_recetas_a_db, recetas)
+        receta_ids = db.session.execute(db.select(Receta.id).order_by(Receta.id)).scalars().all()
+        db.session.remove()
+
+    cliente = app.test_client()
+    for cantidad in (1, 10, 50):
+        seleccion = [{'id': receta_id, 'cantidad': 2} for receta_id in receta_ids[:cantidad]]
+        tiempos[f'calcular_produccion_{cantidad}'] = _repetir(
+            lambda: cliente.post('/calcular-produccion', json={'recetas': seleccion}), repeticiones
+        )
+
+    for ruta in ('/stock', '/recetas', '/produccion'):
+        nombre = ruta.strip('/')
+        tiempos[f'pagina_{nombre}_primera'], _ = _cronometrar(cliente.get, ruta)
+        tiempos[f'pagina_{nombre}'] = _repetir(lambda: cliente.get(ruta), repeticiones)
+
+    memoria = {}
+    seleccion = [{'id': receta_id, 'cantidad': 2} for receta_id in receta_ids[:50]]
+    memoria['pagina_stock'] = _memoria_pico(lambda: cliente.get('/stock'))
+    # Sin fragmentos cacheados, para medir el armado completo de /recetas
+    invalidar_recetas()
+    memoria['pagina_recetas'] = _memoria_pico(lambda: cliente.get('/recetas'))
+    memoria['calcular_produccion_50'] = _memoria_pico(
+        lambda: cliente.post('/calcular-produccion', json={'recetas': seleccion})
+    )
+    memoria['pagina_stock_por_10k_lotes'] = memoria['pagina_stock'] * 10000 / max(1, len(df))
+
+    return {
+        'filas_inventario': len(df),
+        'recetas': len(recetas_dict),
+        'tiempos_s': {k: round(v, 4) for k, v in tiempos.items()},
+        'memoria_kb': {k: round(v, 1) for k, v in memoria.items()},
+    }
+
+
+def comparar(actual, anterior):
+    """Imprime la variación de cada medición respecto de una ejecución anterior."""
+    print(f"\nComparación con {anterior['meta']['commit']} ({anterior['meta']['fecha']})")
+    print(f"{'tamaño':>8}  {'medición':<32}{'antes':>10}{'ahora':>10}{'cambio':>9}")
+    for tamano, datos in actual['resultados'].items():
+        previos = anterior['resultados'].get(tamano)
+        if not previos:
+            continue
+        for medicion, ahora in datos['tiempos_s'].items():
+            antes = previos['tiempos_s'].get(medicion)
+            if not antes:
+                continue
+            cambio = (ahora - antes) / antes * 100
+            alerta = '  <-- regresión' if cambio > 20 else ''
+            print(f"{tamano:>8}  {medicion:<32}{antes:>10.4f}{ahora:>10.4f}{cambio:>8.1f}%{alerta}")
+        for medicion, ahora in datos.get('memoria_kb', {}).items():
+            antes = previos.get('memoria_kb', {}).get(medicion)
+            if not antes:
+                continue
+            cambio = (ahora - antes) / antes * 100
+            alerta = '  <-- regresión' if cambio > 20 else ''
+            print(f"{tamano:>8}  {'memoria ' + medicion + ' (KB)':<32}{antes:>10.0f}{ahora:>10.0f}{cambio:>8.1f}%{alerta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000],
+                        help='Filas de inventario y de recetas a generar (1000 a 1000000)')
+    parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', default=DIR_RESULTADOS, help='Carpeta donde guardar el JSON')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior')
+    args = parser.parse_args()
+
+    # Base temporal: los benchmarks nunca tocan instance/app.db
+    directorio_db = tempfile.mkdtemp(prefix='applab_bench_')
+    os.environ['APPLAB_DATABASE_URI'] = f"sqlite:///{os.path.join(directorio_db, 'bench.db')}"
+    from app import app, db
+    app.config['TESTING'] = True
+
+    resultado = {
+        'meta': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit_actual(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'formato': args.formato,
+            'repeticiones': args.repeticiones,
+        },
+        'resultados': {},
+    }
+
+    for tamano in args.tamanos:
+        print(f'Midiendo {tamano} filas...', flush=True)
+        resultado['resultados'][str(tamano)] = medir_tamano(app, db, tamano, args.formato, args.repeticiones)
+        for medicion, segundos in resultado['resultados'][str(tamano)]['tiempos_s'].items():
+            print(f'  {medicion:<32}{segundos:>10.4f} s')
+        for medicion, kb in resultado['resultados'][str(tamano)]['memoria_kb'].items():
+            print(f'  {"memoria " + medicion:<36}{kb:>10.0f} KB')
+
+    os.makedirs(args.salida, exist_ok=True)
+    archivo = os.path.join(
+        args.salida, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{resultado['meta']['commit']}.json"
+    )
+    with open(archivo, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f'\nResultados guardados en {archivo}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Generadores de datos sintéticos de laboratorio para los benchmarks.
+
+- Inventario: el mismo formato que exporta el ERP y que espera
+  limpiar_inventario_csv (encabezados basura, fila con "Artículo",
+  columnas Artículo / Descripción / Lote / Vto. / Estado / Unidad / Cantidad / Total
+  y filas de subtotal sin código).
+- Recetas: el formato con columnas desplazadas que espera procesar_recetas_csv
+  (fila de receta con "Artículo" en col 1, código en col 2 y nombre en col 5;
+  componentes con paso en col 1, código en col 12, nombre en col 14,
+  unidad en col 16 y cantidad en col 17).
+
+Los datos son reproducibles: la misma semilla genera los mismos archivos.
+
+Uso:
+    python benchmarks/generadores.py inventario datos/inv_100k.csv --filas 100000
+    python benchmarks/generadores.py recetas datos/rec_10k.xlsx --filas 10000
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+NOMBRES_BASE = [
+    'Ácido cítrico', 'Cloruro de sodio', 'Alcohol etílico', 'Glicerina', 'Agua purificada',
+    'Extracto de manzanilla', 'Vitamina E', 'Aceite de almendras', 'Carbopol', 'Propilenglicol',
+    'Metilparabeno', 'Lanolina', 'Óxido de zinc', 'Talco', 'Estearato de magnesio',
+    'Lactosa', 'Almidón de maíz', 'Celulosa microcristalina', 'Sacarosa', 'Esencia de vainilla',
+]
+# (unidad como viene en el ERP, rango de cantidades)
+UNIDADES = [('Kg', (0.5, 50)), ('g', (10, 5000)), ('L', (0.5, 20)), ('ml', (50, 5000)), ('uni', (1, 500))]
+ESTADOS = ['Aprobado', 'Aprobado', 'Aprobado', 'Cuarentena', 'Rechazado']
+COLUMNAS_RECETAS = 18
+
+
+def codigo_producto(i):
+    return f'MP{i:06d}'
+
+
+def nombre_producto(i):
+    return f'{NOMBRES_BASE[i % len(NOMBRES_BASE)]} {i // len(NOMBRES_BASE) + 1}'
+
+
+def _escritor(ruta):
+    """Devuelve (agregar_fila, cerrar) para escribir CSV o XLSX (modo solo escritura)."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    if ruta.lower().endswith('.xlsx'):
+        from openpyxl import Workbook
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet('Hoja1')
+
+        def agregar(fila):
+            hoja.append([None if v == '' else v for v in fila])
+
+        return agregar, lambda: libro.save(ruta)
+
+    archivo = open(ruta, 'w', newline='', encoding='utf-8')
+    escritor = csv.writer(archivo)
+    return escritor.writerow, archivo.close
+
+
+def generar_inventario(ruta, filas, productos=None, semilla=42, hoy=None):
+    """
+    Genera un export de inventario con `filas` lotes (sin contar encabezados ni subtotales).
+    Cada producto tiene varios lotes; ~10% vencidos, ~15% próximos a vencer.
+    """
+    rnd = random.Random(semilla)
+    hoy = hoy or date.today()
+    productos = productos or max(1, filas // 4)
+    agregar, cerrar = _escritor(ruta)
+
+    # Encabezados del reporte como los exporta el ERP
+    agregar(['Listado de stock por lote', '', '', '', '', '', '', '', '', ''])
+    agregar(['', f'Fecha: {hoy.isoformat()}', '', '', '', '', '', '', '', ''])
+    agregar(['', '', '', '', '', '', '', '', '', ''])
+    agregar(['', 'Artículo', '', 'Descripción', 'Lote', 'Vto.', 'Estado', 'Unidad', 'Cantidad', 'Total'])
+
+    for i in range(filas):
+        p = rnd.randrange(productos)
+        unidad, (minimo, maximo) = UNIDADES[p % len(UNIDADES)]
+        sorteo = rnd.random()
+        if sorteo < 0.10:
+            vencimiento = hoy - timedelta(days=rnd.randint(1, 365))
+        elif sorteo < 0.25:
+            vencimiento = hoy + timedelta(days=rnd.randint(0, 89))
+        elif sorteo < 0.95:
+            vencimiento = hoy + timedelta(days=rnd.randint(90, 1500))
+        else:
+            vencimiento = None
+        cantidad = round(rnd.uniform(minimo, maximo), 2)
+        agregar([
+            '', codigo_producto(p), '', nombre_producto(p), f'L{i:07d}',
+            vencimiento.isoformat() if vencimiento else '', rnd.choice(ESTADOS), unidad,
+            cantidad, round(cantidad * rnd.uniform(1, 30), 2),
+        ])
+        # Subtotal cada tanto (fila sin código que el parser debe descartar)
+        if i % 500 == 499:
+            agregar(['', '', '', 'Subtotal', '', '', '', '', '', ''])
+
+    cerrar()
+    return ruta
+
+
+def generar_recetas(ruta, filas, componentes_por_receta=8, productos=None, semilla=42):
+    """
+    Genera un libro de recetas de aproximadamente `filas` filas
+    (una fila por receta más una por componente).
+    """
+    rnd = random.Random(semilla)
+    recetas = max(1, filas // (componentes_por_receta + 1))
+    productos = productos or max(componentes_por_receta, recetas)
+    agregar, cerrar = _escritor(ruta)
+
+    def fila_vacia():
+        return [''] * COLUMNAS_RECETAS
+
+    agregar(fila_vacia())
+    for r in range(recetas):
+        encabezado = fila_vacia()
+        encabezado[1] = 'Artículo'
+        encabezado[2] = f'PT{r:06d}'
+        encabezado[5] = f'Producto terminado {r + 1}'
+        agregar(encabezado)
+
+        # Fila de títulos que el parser debe ignorar
+        titulos = fila_vacia()
+        titulos[1], titulos[12], titulos[14], titulos[16], titulos[17] = 'Paso', 'Código', 'Descripción', 'Unidad', 'Cantidad'
+        agregar(titulos)
+
+        for paso, p in enumerate(rnd.sample(range(productos), min(componentes_por_receta, productos)), start=1):
+            unidad, (minimo, maximo) = UNIDADES[p % len(UNIDADES)]
+            componente = fila_vacia()
+            componente[1] = str(paso)
+            componente[12] = codigo_producto(p)
+            componente[14] = nombre_producto(p)
+            componente[16] = unidad
+            # Algunas cantidades vienen con coma decimal, como en el ERP
+            cantidad = round(rnd.uniform(minimo, maximo) / 10, 3)
+            componente[17] = str(cantidad).replace('.', ',') if rnd.random() < 0.3 else cantidad
+            agregar(componente)
+
+    cerrar()
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tipo', choices=['inventario', 'recetas'])
+    parser.add_argument('ruta', help='Archivo de salida (.csv o .xlsx)')
+    parser.add_argument('--filas', type=int, default=1000)
+    parser.add_argument('--productos', type=int, default=None, help='Cantidad de códigos distintos')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.tipo == 'inventario':
+        generar_inventario(args.ruta, args.filas, productos=args.productos, semilla=args.semilla)
+    else:
+        generar_recetas(args.ruta, args.filas, productos=args.productos, semilla=args.semilla)
+    print(args.ruta)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,8 +26,10 @@ PyInstaller.__main__.run([
     '--hidden-import=flask_sqlalchemy',
     '--hidden-import=sqlalchemy',
     '--hidden-import=pandas',
+    '--hidden-import=numpy',
     '--hidden-import=openpyxl',          # Para leer Excel
     '--hidden-import=xlrd',              # Para leer XLS antiguos
+    '--hidden-import=waitress',          # Servidor en modo produccion
     '--collect-all=flask',
     '--collect-all=sqlalchemy',
 ])